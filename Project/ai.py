@@ -0,0 +1,202 @@
+from array import array
+from engine import UP, DOWN, LEFT, RIGHT, NOOP, MOVE_UP, MOVE_DOWN, MOVE_LEFT, MOVE_RIGHT
+
+# Autopilot for a snake of an Engine, used for the CPU player and the menu
+# backdrop. It walks the shortest path to the nearest food, found by a
+# breadth-first search over the occupancy grid. The search follows the
+# grid's neighbour tables, so paths wrap around the edges like moves do.
+#
+# Search state is allocated once per grid: a visited stamp per cell (a
+# cell counts as visited when its stamp equals the current search's
+# generation, so nothing is cleared between searches), a parent per cell
+# and the queue. A path is kept until it is invalidated, i.e. the next
+# cell got blocked, the food was eaten or the snake respawned, and only
+# then searched again.
+#
+# Before every move the autopilot also checks the snake would not be
+# walking into a pocket: a flood fill from the cell the head moves to must
+# reach the snake's tail or find at least as many free cells as the snake
+# is long. The fill marks cells in a scratch bytearray with a generation
+# number, so it is only cleared once every 255 fills. Within one tick a
+# cell already marked by an earlier fill is in that fill's region, so its
+# result is reused instead of filling again.
+#
+# A rejected path, or a search that found no food, would most likely come
+# out the same on the next tick, so the autopilot takes the fallback for
+# REPLAN_DELAY ticks before searching again. A boxed-in snake then pays a
+# full search once every few ticks instead of on every one.
+
+DIRECTIONS = [UP, DOWN, LEFT, RIGHT]
+DIRECTION_ACTIONS = {UP: MOVE_UP, DOWN: MOVE_DOWN, LEFT: MOVE_LEFT, RIGHT: MOVE_RIGHT}
+REPLAN_DELAY = 4  # ticks on the fallback after a failed or unsafe search
+
+
+class Autopilot:
+    def __init__(self, engine, index):
+        self.engine = engine
+        self.index = index
+        grid = engine.grid
+        self.tables = [grid.neighbors[direction] for direction in DIRECTIONS]
+        self.stamp = array("i", bytes(4 * grid.size))
+        self.parent = array("i", bytes(4 * grid.size))
+        self.queue = array("i", bytes(4 * grid.size))
+        self.generation = 0
+        self.fill_mark = bytearray(grid.size)
+        self.fill_generation = 0
+        self.fill_results = {}  # fill generation -> space found, this tick only
+        self.fill_tick = -1
+        self.path = []  # cells still to walk, the next one last
+        self.target = -1
+        self.searches = 0
+        self.replan_tick = 0  # no search before this engine tick
+
+    def search(self, head):
+        # BFS from head to the nearest food, fills self.path. False if no
+        # food can be reached.
+        grid = self.engine.grid
+        cells, food = grid.cells, grid.food
+        stamp, parent, queue = self.stamp, self.parent, self.queue
+        tables = self.tables
+        self.generation += 1
+        generation = self.generation
+        self.searches += 1
+
+        stamp[head] = generation
+        queue[0] = head
+        read, write = 0, 1
+        while read < write:
+            cell = queue[read]
+            read += 1
+            for table in tables:
+                n = table[cell]
+                if stamp[n] == generation or cells[n]:
+                    continue
+                stamp[n] = generation
+                parent[n] = cell
+                if food[n]:
+                    self.target = n
+                    path = self.path
+                    path.clear()
+                    while n != head:
+                        path.append(n)
+                        n = parent[n]
+                    return True
+                queue[write] = n
+                write += 1
+
+        self.path.clear()
+        self.target = -1
+        return False
+
+    def next_step(self, head):
+        # The next cell of the current path if it can still be taken from head
+        path = self.path
+        if not path or not self.engine.grid.food[self.target]:
+            return None
+        cell = path[-1]
+        if self.engine.grid.cells[cell]:
+            return None
+        for table in self.tables:
+            if table[head] == cell:
+                return cell
+        return None  # the snake is somewhere else, e.g. respawned
+
+    def direction_to(self, head, cell):
+        for direction, table in zip(DIRECTIONS, self.tables):
+            if table[head] == cell:
+                return direction
+        return None
+
+    def space(self, start):
+        # Room the snake has once its head moved to start: the free cells
+        # reachable from there, counted up to the snake's length. Reaching
+        # the tail counts as enough, it keeps moving out of the way.
+        engine = self.engine
+        snake = engine.snakes[self.index]
+        limit = snake.length
+        mark = self.fill_mark
+        if self.fill_tick != engine.tick:
+            self.fill_tick = engine.tick
+            self.fill_results.clear()
+        result = self.fill_results.get(mark[start])
+        if result is not None:
+            return result
+
+        self.fill_generation += 1
+        if self.fill_generation > 255:
+            mark[:] = bytes(len(mark))
+            self.fill_results.clear()
+            self.fill_generation = 1
+        generation = self.fill_generation
+
+        cells = engine.grid.cells
+        tail = snake.tail_cell()
+        queue, tables = self.queue, self.tables
+        mark[start] = generation
+        queue[0] = start
+        read, write = 0, 1
+        count = 0
+        while read < write and count < limit:
+            cell = queue[read]
+            read += 1
+            for table in tables:
+                n = table[cell]
+                if mark[n] == generation:
+                    continue
+                if cells[n]:
+                    if n == tail and n != start:
+                        count = limit
+                        break
+                    continue
+                mark[n] = generation
+                queue[write] = n
+                write += 1
+                count += 1
+        self.fill_results[generation] = count
+        return count
+
+    def safe(self, cell):
+        return self.space(cell) >= self.engine.snakes[self.index].length
+
+    def fallback(self, head):
+        # No safe way to food, head for the free neighbour with the most room
+        cells = self.engine.grid.cells
+        best = []
+        best_space = -1
+        for direction, table in zip(DIRECTIONS, self.tables):
+            cell = table[head]
+            if cells[cell]:
+                continue
+            space = self.space(cell)
+            if space > best_space:
+                best, best_space = [direction], space
+            elif space == best_space:
+                best.append(direction)
+        if not best:
+            return None
+        return self.engine.ai_random.choice(best)
+
+    def action(self, search=True):
+        # search=False keeps to the current path or the fallback this tick,
+        # for callers spreading the searches of many snakes over ticks
+        snake = self.engine.snakes[self.index]
+        head = snake.head_cell()
+        tick = self.engine.tick
+        cell = self.next_step(head)
+        if cell is None and search and tick >= self.replan_tick:
+            if self.search(head):
+                cell = self.path[-1]
+            else:
+                self.replan_tick = tick + REPLAN_DELAY
+        if cell is not None and not self.safe(cell):
+            self.path.clear()  # leads into a pocket
+            self.replan_tick = tick + REPLAN_DELAY
+            cell = None
+        if cell is not None:
+            self.path.pop()
+            direction = self.direction_to(head, cell)
+        else:
+            direction = self.fallback(head)
+        if direction is None:
+            return NOOP
+        return DIRECTION_ACTIONS[direction]
@@ -0,0 +1,113 @@
+import pygame
+import os
+from collections import OrderedDict
+
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+
+SOUNDS_PATH = os.path.join(BASE_PATH, "resources", "sounds")
+MUSIC_PATH = os.path.join(BASE_PATH, "resources", "music.mp3")
+SOUND_NAMES = ["death", "shift", "fruit", "buff", "debuff"]
+
+# Shared, process-wide caches for assets that are expensive to produce
+# and are requested every frame.
+
+TEXT_CACHE_SIZE = 256
+
+_fonts = {}
+_text_cache = OrderedDict()
+
+
+def get_font(path, size):
+    # One Font per (path, size) for the whole process, the TTF is parsed once
+    key = (path, size)
+    font = _fonts.get(key)
+    if font is None:
+        font = pygame.font.Font(path, size)
+        _fonts[key] = font
+    return font
+
+
+def render_text(font, text, color, antialias=True):
+    # Rendered text surfaces, least recently used ones are dropped first.
+    # The returned surface is shared, callers must only blit it.
+    key = (font, text, color, antialias)
+    surface = _text_cache.get(key)
+    if surface is not None:
+        _text_cache.move_to_end(key)
+        return surface
+
+    surface = font.render(text, antialias, color)
+    _text_cache[key] = surface
+    if len(_text_cache) > TEXT_CACHE_SIZE:
+        _text_cache.popitem(last=False)
+    return surface
+
+
+class AudioManager:
+    # Decodes every sound effect once and hands out the shared Sound
+    # objects. Music is streamed by pygame.mixer.music and left running
+    # when a scene asks for the track that is already playing.
+    def __init__(self):
+        self.sounds = {}
+        self.effects_volume = 1.0
+        self.music_path = None
+
+    def bind(self, settings):
+        # Follow the volumes in the shared settings from now on
+        self.set_effects_volume(settings["sound_effects_volume"])
+        self.set_music_volume(settings["music_volume"])
+        settings.subscribe(self.on_setting_changed)
+
+    def on_setting_changed(self, key, value):
+        if key == "music_volume":
+            self.set_music_volume(value)
+        elif key == "sound_effects_volume":
+            self.set_effects_volume(value)
+
+    def preload(self, names=SOUND_NAMES):
+        for name in names:
+            self.sound(name)
+
+    def sound(self, name):
+        if name not in self.sounds:
+            if not pygame.mixer.get_init():
+                return None  # audio still starting up, try again next time
+            try:
+                sound = pygame.mixer.Sound(os.path.join(SOUNDS_PATH, f"{name}.wav"))
+                sound.set_volume(self.effects_volume)
+            except pygame.error as e:
+                print("Failed to load sound:", e)
+                sound = None  # remembered, so a missing device is not retried on every click
+            self.sounds[name] = sound
+        return self.sounds[name]
+
+    def play(self, name):
+        sound = self.sound(name)
+        if sound is not None:
+            sound.play()
+
+    def set_effects_volume(self, volume):
+        self.effects_volume = volume
+        for sound in self.sounds.values():
+            if sound is not None:
+                sound.set_volume(volume)
+
+    def play_music(self, path=MUSIC_PATH, volume=None):
+        try:
+            if self.music_path != path or not pygame.mixer.music.get_busy():
+                pygame.mixer.music.load(path)
+                pygame.mixer.music.play(-1)
+                self.music_path = path
+            if volume is not None:
+                pygame.mixer.music.set_volume(volume)
+        except pygame.error as e:
+            print("Failed to load music:", e)
+
+    def set_music_volume(self, volume):
+        try:
+            pygame.mixer.music.set_volume(volume)
+        except pygame.error as e:
+            print("Failed to set music volume:", e)
+
+
+audio = AudioManager()
@@ -0,0 +1,267 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+# Micro and macro benchmarks for the engine and the renderer.
+#
+#   python bench.py                 full run, JSON on stdout
+#   python bench.py --quick -o out.json
+#
+# Every operation is timed on its own with perf_counter_ns, less the cost
+# of reading the clock. ops_per_sec is the overall rate, p50_us / p99_us
+# are percentiles of those times, max_us the slowest one and samples is
+# how many were taken.
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+from engine import Engine, RIGHT, NOOP, MOVE_UP, MOVE_DOWN, MOVE_LEFT, MOVE_RIGHT
+
+
+def timer_overhead():
+    # Median time between two back to back clock reads, in ns
+    clock = time.perf_counter_ns
+    reads = []
+    for _ in range(10000):
+        start = clock()
+        reads.append(clock() - start)
+    reads.sort()
+    return reads[len(reads) // 2]
+
+def measure(name, op, count=1000, setup=None, **params):
+    if setup is not None:
+        setup()
+    op()  # warm up
+    clock = time.perf_counter_ns
+    overhead = timer_overhead()
+    samples = [0] * count
+    for i in range(count):
+        start = clock()
+        op()
+        samples[i] = max(clock() - start - overhead, 0)
+    total_time = sum(samples) / 1e9
+    samples.sort()
+    return {
+        "name": name,
+        "params": params,
+        "ops_per_sec": count / total_time if total_time else float("inf"),
+        "p50_us": samples[count // 2] / 1e3,
+        "p99_us": samples[min(count - 1, int(count * 0.99))] / 1e3,
+        "max_us": samples[-1] / 1e3,
+        "samples": count,
+        "timer_overhead_ns": overhead,
+    }
+
+def long_snake(length):
+    # A single row a bit wider than the snake, it slides along it forever
+    engine = Engine(width=length + 16, height=3, seed=0)
+    snake = engine.snakes[0]
+    snake.direction = RIGHT
+    snake.length = length
+    for _ in range(length):
+        snake.move()
+    return engine, snake
+
+def bench_move(lengths, scale):
+    results = []
+    for length in lengths:
+        engine, snake = long_snake(length)
+        results.append(measure("snake_move", snake.move, count=20000 * scale, length=length))
+    return results
+
+def bench_collision(scale):
+    engine, snake = long_snake(1000)
+    grid = engine.grid
+    cells = [grid.neighbors[RIGHT][c] for c in snake.cells()]
+    state = {"i": 0}
+
+    def op():
+        i = state["i"]
+        grid.occupied(cells[i])
+        state["i"] = (i + 1) % len(cells)
+    return [measure("collision_check", op, count=20000 * scale, length=1000)]
+
+def bench_spawn(scale):
+    results = []
+    for fill in (0.0, 0.5, 0.99):
+        engine = Engine(width=64, height=36, seed=0)
+        grid = engine.grid
+        for cell in range(int(grid.size * fill)):
+            if grid.free_index[cell] >= 0:
+                grid.occupy(cell)
+        rng = engine.spawn_random
+
+        def spawn():
+            grid.random_free_cell(rng)
+
+        def food():
+            engine.remove_food(engine.foods[-1]) if engine.foods else None
+            engine.foods.append(engine.get_random_food())
+        results.append(measure("free_cell_spawn", spawn, count=20000 * scale, fill=fill))
+        results.append(measure("get_random_food", food, count=20000 * scale, fill=fill))
+    return results
+
+def bench_engine_step(scale):
+    engine = Engine(seed=0)
+    actions = [MOVE_UP, NOOP, MOVE_LEFT, NOOP, MOVE_DOWN, NOOP, MOVE_RIGHT, NOOP]
+    state = {"i": 0}
+
+    def op():
+        i = state["i"]
+        state["i"] = i + 1
+        for event in engine.step([actions[(i // 4) % len(actions)]]):
+            if event[0] == "death":
+                engine.reset_snake(0)
+    return [measure("engine_step", op, count=20000 * scale)]
+
+def bench_autopilot(scale):
+    # Full searches on the default board with a long snake, the worst case
+    # for a replan since the nearest food is usually far away
+    from ai import Autopilot
+    engine = Engine(seed=0)
+    pilot = Autopilot(engine, 0)
+    for _ in range(3000):
+        for event in engine.step([pilot.action()]):
+            if event[0] == "death":
+                engine.reset_snake(0)
+    snake = engine.snakes[0]
+    head = snake.head_cell()
+    start = next(table[head] for table in pilot.tables if not engine.grid.cells[table[head]])
+
+    def space():
+        engine.tick += 1  # a new tick, so the per-tick region cache does not answer
+        pilot.space(start)
+    return [measure("autopilot_search", lambda: pilot.search(head), count=200 * scale, length=snake.length),
+            measure("autopilot_space", space, count=200 * scale, length=snake.length)]
+
+def bench_backdrop(scale):
+    # The menu's autopilot snakes, one step is a move of all of them and
+    # includes the frames where every snake replans at once. The worst
+    # step has to fit in a 16 ms frame.
+    from main import BackgroundSnakes, DEMO_STEP_FRAMES
+    results = []
+    for size in ((1280, 720), (1920, 1080)):
+        results.append(measure("backdrop_build", lambda: BackgroundSnakes(size, 0), count=20 * scale, window=list(size)))
+        backdrop = BackgroundSnakes(size, 0)
+
+        def step():
+            for _ in range(DEMO_STEP_FRAMES):
+                backdrop.move()
+        result = measure("backdrop_step", step, count=600 * scale, window=list(size),
+                         grid=[backdrop.engine.width, backdrop.engine.height])
+        result["searches"] = sum(pilot.searches for pilot in backdrop.autopilots)
+        results.append(result)
+    return results
+
+def bench_vecenv(scale):
+    from vecenv import VectorEnv, np
+    results = []
+    num_envs = 1024
+    rng = random.Random(0)
+    actions = [[rng.randrange(5) for _ in range(num_envs)] for _ in range(64)]
+    for backend in ("python", "numpy"):
+        if backend == "numpy" and np is None:
+            continue
+        env = VectorEnv(num_envs, 16, 16, seed=0, backend=backend)
+        batch = [np.array(a, dtype=np.int32) for a in actions] if backend == "numpy" else actions
+        state = {"i": 0}
+
+        def op():
+            env.step(batch[state["i"] % len(batch)])
+            state["i"] += 1
+        result = measure("vecenv_step", op, count=100 * scale, backend=backend, num_envs=num_envs, grid=[16, 16])
+        result["game_steps_per_sec"] = result["ops_per_sec"] * num_envs
+        results.append(result)
+    return results
+
+def bench_subproc(scale):
+    # Scales with cores, compare with vecenv_step on the same machine
+    from subproc import SubprocVectorEnv
+    num_envs = 4096
+    rng = random.Random(0)
+    actions = [[rng.randrange(5) for _ in range(num_envs)] for _ in range(16)]
+    with SubprocVectorEnv(num_envs, width=16, height=16, seed=0) as env:
+        state = {"i": 0}
+
+        def op():
+            env.step(actions[state["i"] % len(actions)])
+            state["i"] += 1
+        result = measure("subproc_step", op, count=20 * scale, num_envs=num_envs,
+                         workers=len(env.processes), grid=[16, 16])
+    result["game_steps_per_sec"] = result["ops_per_sec"] * num_envs
+    return [result]
+
+def bench_rendering(scale):
+    import pygame
+    from main import WINDOW_SIZES
+    from snake import SinglePlayerGame
+
+    pygame.init()
+    results = []
+    for size in WINDOW_SIZES:
+        screen = pygame.display.set_mode(size)
+        game = SinglePlayerGame(screen, seed=0)
+        engine, renderer = game.engine, game.renderer
+        snake = engine.snakes[0]
+        snake.length = 200
+        state = {"i": 0}
+
+        def tick():
+            # One gameplay tick: simulation plus a dirty-rect frame
+            i = state["i"]
+            state["i"] = i + 1
+            action = MOVE_DOWN if i % 40 == 0 else (MOVE_RIGHT if i % 40 == 20 else NOOP)
+            for event in engine.step([action]):
+                if event[0] == "death":
+                    engine.reset_snake(0)
+                    snake.length = 200
+            renderer.draw(game.hud_lines())
+
+        def full_frame():
+            renderer.invalidate()
+            renderer.draw(game.hud_lines())
+
+        for _ in range(250):
+            tick()  # grow the snake before timing
+        results.append(measure("single_player_tick", tick, count=200 * scale, window=list(size)))
+        results.append(measure("full_frame", full_frame, count=50 * scale, window=list(size)))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Snake engine and renderer benchmarks")
+    parser.add_argument("--quick", action="store_true", help="fewer samples, for a smoke run")
+    parser.add_argument("--no-render", action="store_true", help="skip benchmarks that need pygame")
+    parser.add_argument("-o", "--output", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+    scale = 1 if args.quick else 5
+
+    results = []
+    results += bench_move([3, 100, 1000, 10000], scale)
+    results += bench_collision(scale)
+    results += bench_spawn(scale)
+    results += bench_engine_step(scale)
+    results += bench_autopilot(scale)
+    results += bench_vecenv(scale)
+    results += bench_subproc(scale)
+    if not args.no_render:
+        results += bench_backdrop(scale)
+        results += bench_rendering(scale)
+
+    report = {
+        "python": sys.version.split()[0],
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text)
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
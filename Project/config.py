@@ -0,0 +1,130 @@
+import pygame
+import os
+import json
+import time
+import atexit
+import threading
+
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+
+CONFIG_PATH = os.path.join(BASE_PATH, "resources", "config.json")
+
+SAVE_DELAY = 0.5  # seconds of quiet before a burst of edits is written
+
+_settings = None
+
+
+# Load settings config
+def load_config():
+    try:
+        if not os.path.exists(CONFIG_PATH): 
+            raise FileNotFoundError("Config file not found.")
+        
+        with open(CONFIG_PATH, "r") as file:
+            config = json.load(file)
+
+        if "key_bindings" not in config:
+            raise KeyError("Key bindings not found in config.")
+
+        for player in config["key_bindings"]:
+            for action in config["key_bindings"][player]:
+                key_str = config["key_bindings"][player][action]
+                if isinstance(key_str, str): # Only convert if it's a string
+                    try:
+                        config["key_bindings"][player][action] = getattr(pygame, key_str)
+                    except AttributeError:
+                        raise ValueError(f"Invalid key binding: {key_str} for {player} - {action}")
+        return config
+
+    except FileNotFoundError as e:
+        print(f"Error: {e}")
+    except json.JSONDecodeError as e:
+        print(f"Error decoding JSON: {e}")
+    except (KeyError, ValueError) as e:
+        print(f"Error in config structure: {e}")
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+    
+    return None
+
+
+class Settings(dict):
+    # The settings, loaded once and shared by every scene. Assigning a key
+    # notifies the subscribers and schedules a save. Saves are coalesced and
+    # written by a background thread as one atomic write-rename, so the UI
+    # thread never waits on the disk and a crash cannot truncate the file.
+    def __init__(self, data, path=CONFIG_PATH):
+        super().__init__(data)
+        self.path = path
+        self.listeners = []
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._pending = None
+        self._due = 0
+        self._writer = None
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        for listener in self.listeners:
+            listener(key, value)
+        self.save()
+
+    def subscribe(self, listener):
+        # listener(key, value) is called after every top level assignment
+        self.listeners.append(listener)
+
+    def save(self):
+        # Nested edits (key bindings) must call this themselves
+        data = json.dumps(self, indent=4)
+        with self._cond:
+            self._pending = data
+            self._due = time.monotonic() + SAVE_DELAY
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._run, name="settings-writer", daemon=True)
+                self._writer.start()
+            self._cond.notify()
+
+    def flush(self):
+        self._write_pending()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None:
+                    self._cond.wait()
+                delay = self._due - time.monotonic()
+                while delay > 0:
+                    self._cond.wait(delay)
+                    delay = self._due - time.monotonic()
+            self._write_pending()
+
+    def _write_pending(self):
+        # The snapshot is taken under the write lock, so whichever of the
+        # writer thread and flush() writes last also holds the newest data
+        with self._write_lock:
+            with self._cond:
+                data, self._pending = self._pending, None
+            if data is not None:
+                self._write(data)
+
+    def _write(self, data):
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w") as file:
+                file.write(data)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Error saving config: {e}")
+
+
+def get_settings():
+    global _settings
+    if _settings is None:
+        config = load_config()
+        if config is None:
+            return None
+        _settings = Settings(config)
+        atexit.register(_settings.flush)
+    return _settings
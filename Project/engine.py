@@ -0,0 +1,389 @@
+import random
+from array import array
+
+# Pure game rules, no pygame. Everything here works in grid cells, the
+# pygame front end (snake.py) only converts cells to pixels and draws.
+
+UP = (0, -1)
+DOWN = (0, 1)
+LEFT = (-1, 0)
+RIGHT = (1, 0)
+
+# Actions passed to Engine.step, one per snake. None means the snake is not
+# scheduled to move this step. SPRINT can be or-ed with any direction.
+NOOP = 0
+MOVE_UP = 1
+MOVE_DOWN = 2
+MOVE_LEFT = 3
+MOVE_RIGHT = 4
+SPRINT = 8
+
+ACTION_DIRECTIONS = {
+    MOVE_UP: UP,
+    MOVE_DOWN: DOWN,
+    MOVE_LEFT: LEFT,
+    MOVE_RIGHT: RIGHT,
+}
+
+
+class Grid:
+    # Occupancy counts for every cell, shared by all snakes of an engine.
+    # Cells are integer indices (y * width + x). Counts are updated
+    # incrementally as heads are pushed and tails popped, so a collision
+    # check is a single lookup whatever the snake lengths.
+    #
+    # Alongside it a free-cell set (cells with no snake and no food) is kept
+    # as a swap-remove array plus a position index, so picking a uniformly
+    # random empty cell is O(1) however full the board is.
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.size = width * height
+        self.cells = bytearray(self.size)
+        self.food = bytearray(self.size)
+        self.free = array("i", range(self.size))
+        self.free_index = array("i", range(self.size))
+        self.free_count = self.size
+        # Set to a list by a renderer that wants to know which cells changed
+        self.dirty = None
+
+        # Wrapped neighbour of every cell in each direction, matching the
+        # modulo wrap of the original pixel based movement. Each row is the
+        # target row's cells rotated by dx, built from ranges.
+        self.neighbors = {}
+        for dx, dy in (UP, DOWN, LEFT, RIGHT):
+            table = array("i")
+            shift = dx % width
+            for y in range(height):
+                start = ((y + dy) % height) * width
+                table.extend(range(start + shift, start + width))
+                table.extend(range(start, start + shift))
+            self.neighbors[(dx, dy)] = table
+
+    def index(self, x, y):
+        return y * self.width + x
+
+    def position(self, cell):
+        return (cell % self.width, cell // self.width)
+
+    def clear(self):
+        self.cells[:] = bytes(self.size)
+        self.food[:] = bytes(self.size)
+        self.free[:] = array("i", range(self.size))
+        self.free_index[:] = array("i", range(self.size))
+        self.free_count = self.size
+
+    def occupied(self, cell):
+        return self.cells[cell] != 0
+
+    def occupy(self, cell):
+        self.cells[cell] += 1
+        if self.dirty is not None:
+            self.dirty.append(cell)
+        if self.free_index[cell] >= 0:
+            self.take(cell)
+
+    def vacate(self, cell):
+        self.cells[cell] -= 1
+        if self.dirty is not None:
+            self.dirty.append(cell)
+        if not self.cells[cell] and not self.food[cell]:
+            self.release(cell)
+
+    def place_food(self, cell):
+        self.food[cell] = 1
+        if self.dirty is not None:
+            self.dirty.append(cell)
+        if self.free_index[cell] >= 0:
+            self.take(cell)
+
+    def remove_food(self, cell):
+        self.food[cell] = 0
+        if self.dirty is not None:
+            self.dirty.append(cell)
+        if not self.cells[cell]:
+            self.release(cell)
+
+    def take(self, cell):
+        i = self.free_index[cell]
+        self.free_count -= 1
+        last = self.free[self.free_count]
+        self.free[i] = last
+        self.free_index[last] = i
+        self.free_index[cell] = -1
+
+    def release(self, cell):
+        self.free[self.free_count] = cell
+        self.free_index[cell] = self.free_count
+        self.free_count += 1
+
+    def random_free_cell(self, rng):
+        if not self.free_count:
+            return None
+        return self.free[rng.randrange(self.free_count)]
+
+
+class Snake():
+    def __init__(self, engine):
+        self.engine = engine
+        rng = engine.cosmetic_random
+        self.color = (rng.randint(5, 200), rng.randint(5, 200), rng.randint(5, 200))
+        # Ring buffer of body cells, head at self.head, self.size cells long.
+        # A snake never covers more cells than the grid has, so it never grows.
+        self.body = array("i", bytes(4 * engine.grid.size))
+        self.head = 0
+        self.size = 0
+        self.reset()
+
+    def reset(self):
+        grid = self.engine.grid
+        for cell in self.cells():
+            grid.vacate(cell)
+        self.length = 1
+        self.head = 0
+        self.size = 1
+        self.body[0] = grid.index(self.engine.width // 2, self.engine.height // 2)
+        grid.occupy(self.body[0])
+        self.direction = self.engine.spawn_random.choice([UP, DOWN, LEFT, RIGHT])
+        self.score = 0
+        self.speed_modifier = 1
+        self.effect_timer = 0
+
+    def update_speed(self):
+        if self.effect_timer > 0:
+            self.effect_timer -= 1
+            if self.effect_timer == 0:
+                self.speed_modifier = 1
+
+    def head_cell(self):
+        return self.body[self.head]
+
+    def tail_cell(self):
+        return self.body[(self.head + self.size - 1) % len(self.body)]
+
+    def cells(self):
+        body, capacity = self.body, len(self.body)
+        for i in range(self.head, self.head + self.size):
+            yield body[i % capacity]
+
+    def positions(self):
+        grid = self.engine.grid
+        for cell in self.cells():
+            yield grid.position(cell)
+
+    def get_head_position(self):
+        return self.engine.grid.position(self.body[self.head])
+
+    def turn(self, point):
+        if self.length > 1 and (point[0]*-1, point[1]*-1) == self.direction:
+            return
+        else:
+            self.direction = point
+
+    def sprint(self):
+        if self.speed_modifier == 1:
+            self.speed_modifier = 1.5
+        elif self.speed_modifier == 1.5:
+            self.speed_modifier = 1
+
+    def apply(self, action):
+        if action & SPRINT:
+            self.sprint()
+        point = ACTION_DIRECTIONS.get(action & ~SPRINT)
+        if point is not None:
+            self.turn(point)
+
+    def move(self):
+        self.update_speed()
+        grid = self.engine.grid
+        new = grid.neighbors[self.direction][self.body[self.head]]
+        if grid.cells[new]:
+            return False
+        body = self.body
+        self.head = (self.head - 1) % len(body)
+        body[self.head] = new
+        grid.occupy(new)
+        if self.size < self.length:
+            self.size += 1
+        else:
+            grid.vacate(body[(self.head + self.size) % len(body)])
+        return True
+
+
+class Consumable():
+    kind = "fruit"
+
+    def __init__(self, cell, color=(0, 0, 225), points=10):
+        self.cell = cell
+        self.color = color
+        self.points = points
+
+    def apply_effect(self, snake):
+        pass
+
+class Blueberry(Consumable):
+    def __init__(self, cell):
+        super().__init__(cell, color=(0, 0, 255), points=10)
+
+class Apple(Consumable):
+    def __init__(self, cell):
+        super().__init__(cell, color=(255, 0, 0), points=20)
+
+class Watermelon(Consumable):
+    def __init__(self, cell):
+        super().__init__(cell, color=(0, 255, 0), points=30)
+
+class SpeedBoost(Consumable):
+    kind = "buff"
+
+    def __init__(self, cell):
+        super().__init__(cell, color=(0, 150, 0), points=5)
+
+    def apply_effect(self, snake):
+        snake.speed_modifier = 1.75
+        snake.effect_timer = 200
+
+class SpeedDebuff(Consumable):
+    kind = "debuff"
+
+    def __init__(self, cell):
+        super().__init__(cell, color=(150, 0, 0))
+
+    def apply_effect(self, snake):
+        snake.speed_modifier = 0.7
+        snake.effect_timer = 18
+
+FOOD_TYPES = [Blueberry, Apple, Watermelon, SpeedBoost, SpeedDebuff]
+FOOD_WEIGHTS = [8, 6, 4, 5, 4]
+
+
+def desired_food_count(score):
+    if 200 <= score < 1000:
+        return 3
+    elif score >= 1000:
+        return 5
+    return 1
+
+
+class Engine:
+    def __init__(self, players=1, width=64, height=36, seed=None):
+        self.players = players
+        self.width = width
+        self.height = height
+        self.grid = Grid(width, height)
+        self.recorder = None  # see replay.ReplayRecorder
+        self.profiler = None  # see perf.FrameProfiler
+        self.seeds = None
+        self.reset(seed)
+
+    def reset(self, seed=None):
+        # Every episode has a concrete seed. Without one, the next seed comes
+        # from the stream set up by the last explicit seed, so a sequence of
+        # resets is reproducible too.
+        if seed is not None:
+            self.seeds = random.Random(seed)
+        else:
+            if self.seeds is None:
+                self.seeds = random.Random(random.SystemRandom().getrandbits(64))
+            seed = self.seeds.getrandbits(32)
+        self.seed = seed
+
+        # Independent streams, so e.g. cosmetic changes or an AI never shift food spawns
+        self.spawn_random = random.Random(f"{seed}/spawn")
+        self.cosmetic_random = random.Random(f"{seed}/cosmetic")
+        self.ai_random = random.Random(f"{seed}/ai")
+
+        self.tick = 0
+        self.grid.clear()
+        self.snakes = [Snake(self) for _ in range(self.players)]
+        self.foods = []
+        self.adjust_food_count()
+        return self.state()
+
+    def reset_snake(self, index):
+        if self.recorder is not None:
+            self.recorder.record_reset(index)
+        self.snakes[index].reset()
+
+    def get_random_food(self):
+        # Never lands on a snake or another food, None when the board is full
+        cell = self.grid.random_free_cell(self.spawn_random)
+        if cell is None:
+            return None
+        food_class = self.spawn_random.choices(FOOD_TYPES, weights=FOOD_WEIGHTS)[0]
+        self.grid.place_food(cell)
+        return food_class(cell)
+
+    def remove_food(self, food):
+        self.foods.remove(food)
+        self.grid.remove_food(food.cell)
+
+    def adjust_food_count(self):
+        desired_count = desired_food_count(max(s.score for s in self.snakes))
+
+        while len(self.foods) < desired_count:
+            food = self.get_random_food()
+            if food is None:
+                break
+            self.foods.append(food)
+
+        while len(self.foods) > desired_count:
+            self.remove_food(self.foods[-1])
+
+    def step(self, actions):
+        # Returns a list of ("eat", snake_index, food) and ("death", snake_index)
+        if self.recorder is not None:
+            self.recorder.record_step(actions)
+        events = []
+        moved = []
+        for i, action in enumerate(actions):
+            if action is None:
+                continue
+            snake = self.snakes[i]
+            snake.apply(action)
+            # The occupancy grid is shared, so move() catches both self- and cross-snake collisions
+            if snake.move():
+                moved.append(i)
+            else:
+                events.append(("death", i))
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.mark("sim")
+
+        for i in moved:
+            snake = self.snakes[i]
+            head = snake.head_cell()
+            if not self.grid.food[head]:
+                continue
+            for food in self.foods:
+                if head == food.cell:
+                    snake.length += 1
+                    snake.score += food.points
+                    food.apply_effect(snake)
+                    self.remove_food(food)
+                    events.append(("eat", i, food))
+                    break  # Prevent double-eating
+        if profiler is not None:
+            profiler.mark("collide")
+
+        self.adjust_food_count()
+        if profiler is not None:
+            profiler.mark("spawn")
+        self.tick += 1
+        return events
+
+    def state(self):
+        return {
+            "tick": self.tick,
+            "width": self.width,
+            "height": self.height,
+            "snakes": [{
+                "position": list(s.positions()),
+                "direction": s.direction,
+                "length": s.length,
+                "score": s.score,
+                "speed_modifier": s.speed_modifier,
+                "effect_timer": s.effect_timer,
+            } for s in self.snakes],
+            "foods": [(type(f).__name__, self.grid.position(f.cell), f.points) for f in self.foods],
+        }
@@ -0,0 +1,148 @@
+from array import array
+from engine import Engine, UP, DOWN, LEFT, RIGHT, MOVE_RIGHT
+from vecenv import DEATH_REWARD, np
+
+# Gym-style single agent environment over the engine rules:
+#
+#   env = Env(width=16, height=16, observation="planes")
+#   obs, info = env.reset(seed=0)
+#   obs, reward, terminated, truncated, info = env.step(MOVE_UP)
+#
+# Actions are the engine's NOOP and MOVE_* values. The reward is the
+# points of the food eaten, DEATH_REWARD on death. Observations:
+#   "planes"      uint8 (3, height, width): body, head, food
+#   "egocentric"  uint8 (2, crop, crop): body and food around the head,
+#                 wrapped like the board, the head in the middle
+#   "features"    float32 (11,): danger up/down/left/right, direction
+#                 one-hot, wrapped offset to the nearest food / board size,
+#                 length / board size
+# The observation is written into the same buffer every step and returned
+# as a numpy array view when numpy is installed, a shaped memoryview
+# otherwise. Copy it to keep it past the next step.
+
+OBSERVATION_TYPES = ["planes", "egocentric", "features"]
+DIRECTIONS = [UP, DOWN, LEFT, RIGHT]
+FEATURE_COUNT = 11
+
+
+class Env:
+    action_count = MOVE_RIGHT + 1  # NOOP and the four moves
+
+    def __init__(self, width=64, height=36, observation="planes", crop=11, max_steps=None):
+        if observation not in OBSERVATION_TYPES:
+            raise ValueError(f"Unknown observation type: {observation}")
+        if observation == "egocentric" and crop % 2 == 0:
+            raise ValueError("The egocentric crop needs an odd size")
+        self.width = width
+        self.height = height
+        self.observation_type = observation
+        self.crop = crop
+        self.max_steps = max_steps
+        self.engine = Engine(1, width, height, seed=None)
+        self.grid = self.engine.grid
+
+        size = width * height
+        if observation == "planes":
+            self.observation_shape = (3, height, width)
+            self.buffer = bytearray(3 * size)
+        elif observation == "egocentric":
+            self.observation_shape = (2, crop, crop)
+            self.buffer = bytearray(2 * crop * crop)
+        else:
+            self.observation_shape = (FEATURE_COUNT,)
+            self.buffer = array("f", bytes(4 * FEATURE_COUNT))
+        view = memoryview(self.buffer).cast("B")
+        code = "f" if observation == "features" else "B"
+        if np is not None:
+            self.observation = np.frombuffer(view, "float32" if code == "f" else "uint8").reshape(self.observation_shape)
+        else:
+            self.observation = view.cast(code, self.observation_shape)
+        self.bytes = view
+        self.flat = view.cast(code)
+        self.last_head = 0
+
+    def reset(self, seed=None):
+        self.engine.reset(seed)
+        self.steps = 0
+        self.bytes[:] = bytes(len(self.bytes))
+        self.last_head = self.engine.snakes[0].head_cell()
+        self.observe()
+        return self.observation, self.info()
+
+    def step(self, action):
+        engine = self.engine
+        snake = engine.snakes[0]
+        score = snake.score
+        events = engine.step([action])
+        self.steps += 1
+        terminated = any(event[0] == "death" for event in events)
+        reward = DEATH_REWARD if terminated else float(snake.score - score)
+        truncated = not terminated and self.max_steps is not None and self.steps >= self.max_steps
+        self.observe()
+        return self.observation, reward, terminated, truncated, self.info()
+
+    def info(self):
+        snake = self.engine.snakes[0]
+        return {"score": snake.score, "length": snake.length, "steps": self.steps, "seed": self.engine.seed}
+
+    def observe(self):
+        if self.observation_type == "planes":
+            self.observe_planes()
+        elif self.observation_type == "egocentric":
+            self.observe_egocentric()
+        else:
+            self.observe_features()
+
+    def observe_planes(self):
+        grid = self.grid
+        size = grid.size
+        flat = self.flat
+        flat[0:size] = grid.cells
+        flat[2 * size:3 * size] = grid.food
+        flat[size + self.last_head] = 0
+        self.last_head = self.engine.snakes[0].head_cell()
+        flat[size + self.last_head] = 1
+
+    def observe_egocentric(self):
+        # Row by row, each wrapped row is at most two slice copies per plane
+        grid = self.grid
+        width, height, crop = self.width, self.height, self.crop
+        flat = self.flat
+        half = crop // 2
+        hx, hy = grid.position(self.engine.snakes[0].head_cell())
+        area = crop * crop
+        for row in range(crop):
+            y = (hy - half + row) % height
+            start = y * width
+            out = row * crop
+            x = (hx - half) % width
+            done = 0
+            while done < crop:
+                run = min(crop - done, width - x)
+                source = start + x
+                flat[out + done:out + done + run] = grid.cells[source:source + run]
+                flat[area + out + done:area + out + done + run] = grid.food[source:source + run]
+                done += run
+                x = 0
+
+    def observe_features(self):
+        engine = self.engine
+        grid = self.grid
+        snake = engine.snakes[0]
+        head = snake.head_cell()
+        flat = self.flat
+        for i, direction in enumerate(DIRECTIONS):
+            flat[i] = 1.0 if grid.cells[grid.neighbors[direction][head]] else 0.0
+            flat[4 + i] = 1.0 if snake.direction == direction else 0.0
+
+        hx, hy = grid.position(head)
+        best = None
+        for food in engine.foods:
+            fx, fy = grid.position(food.cell)
+            dx = (fx - hx + self.width // 2) % self.width - self.width // 2
+            dy = (fy - hy + self.height // 2) % self.height - self.height // 2
+            if best is None or abs(dx) + abs(dy) < abs(best[0]) + abs(best[1]):
+                best = (dx, dy)
+        flat[8] = best[0] / self.width if best else 0.0
+        flat[9] = best[1] / self.height if best else 0.0
+        flat[10] = snake.length / grid.size
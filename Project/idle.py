@@ -0,0 +1,33 @@
+import pygame
+import time
+
+# Helpers for scenes that have nothing to animate (pause, game over,
+# settings). Instead of redrawing in a busy loop they sleep in
+# pygame.event.wait and only repaint when an event arrives.
+
+IDLE_TIMEOUT = 500  # ms, upper bound on a single wait
+
+REDRAW_EVENTS = (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.WINDOWRESIZED)
+
+
+def wait_events(timeout=IDLE_TIMEOUT):
+    # Blocks until something happens, [] if the timeout passed quietly
+    event = pygame.event.wait(timeout)
+    if event.type == pygame.NOEVENT:
+        return []
+    return [event] + pygame.event.get()
+
+
+class IdleMeter:
+    # CPU time this process used while a scene was shown, as a share of one core
+    def __init__(self, name):
+        self.name = name
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.process_time()
+
+    def report(self):
+        wall = time.perf_counter() - self.wall_start
+        cpu = time.process_time() - self.cpu_start
+        usage = 100 * cpu / wall if wall > 0 else 0.0
+        print(f"{self.name} idle CPU: {usage:.1f}% over {wall:.1f}s")
+        return usage
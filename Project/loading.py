@@ -0,0 +1,88 @@
+import time
+import threading
+import pygame
+
+# Start-up work that is not needed for the first menu frame (opening the
+# audio device, decoding sounds, starting the music, importing and
+# preparing the game) runs on a background thread while the menu is
+# already on screen.
+
+LOADING_EVENT = pygame.event.custom_type()  # posted after every finished job
+
+
+class AssetLoader:
+    def __init__(self):
+        self.jobs = []  # [(label, function)]
+        self.timings = []  # [(label, seconds)] of finished jobs
+        self.done = 0
+        self.current = None
+        self.thread = None
+        self.finished_at = None
+
+    def add(self, label, function):
+        self.jobs.append((label, function))
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="asset-loader", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        for label, function in self.jobs:
+            self.current = label
+            start = time.perf_counter()
+            try:
+                function()
+            except Exception as e:
+                print(f"Failed to load {label}: {e}")
+            self.timings.append((label, time.perf_counter() - start))
+            self.done += 1
+            self.notify()
+        self.current = None
+        self.finished_at = time.perf_counter()
+        self.notify()
+
+    def notify(self):
+        # Wakes scenes sleeping in pygame.event.wait so they repaint the progress
+        try:
+            pygame.event.post(pygame.event.Event(LOADING_EVENT))
+        except pygame.error:
+            pass  # display already shut down
+
+    @property
+    def finished(self):
+        return self.finished_at is not None
+
+    def progress(self):
+        return self.done / len(self.jobs) if self.jobs else 1.0
+
+    def wait(self, draw, clock):
+        # Blocks until everything is loaded, draw(progress) paints each frame
+        while not self.finished:
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    return False
+            draw(self.progress())
+            clock.tick(30)
+        return True
+
+
+class StartupProfile:
+    # Time-to-first-frame report for --startup-profile. Times are relative
+    # to origin, taken as early as possible in the entry module.
+    def __init__(self, origin):
+        self.origin = origin
+        self.marks = []
+
+    def mark(self, name, at=None):
+        if at is None:
+            at = time.perf_counter()
+        self.marks.append((name, at - self.origin))
+
+    def report(self, loader=None):
+        print("Startup profile:")
+        for name, at in self.marks:
+            print(f"  {name:<24} {at * 1000:8.1f} ms")
+        if loader is not None:
+            print("  background jobs:")
+            for label, seconds in loader.timings:
+                print(f"    {label:<22} {seconds * 1000:8.1f} ms")
@@ -1,14 +1,24 @@
+import time
+START_TIME = time.perf_counter()  # origin of --startup-profile, before the heavy imports
+
 import pygame
 import random
 import sys
 import os
-import json
+import argparse
+from assets import render_text, get_font, audio, SOUND_NAMES
+from config import get_settings
+from idle import wait_events, IdleMeter
+from perf import profiler, TOGGLE_KEY
+from loading import AssetLoader, StartupProfile
+from render import load_background
+from engine import Engine
+from ai import Autopilot
 
 
 BASE_PATH = os.path.dirname(os.path.abspath(__file__))
 
 FONT_PATH = os.path.join(BASE_PATH, "resources", "Daydream.ttf")
-CONFIG_PATH = os.path.join(BASE_PATH, "resources", "config.json")
 SOUND_PATH = os.path.join(BASE_PATH, "resources", "sounds", "fruit.wav")
 
 TEXT_COLOR = (255, 255, 255)
@@ -18,80 +28,75 @@ BACKGROUND_END = (16, 8, 32)
 
 BUTTON_COLOR = (80, 40, 100)
 BUTTON_HOVER_COLOR = (120, 80, 100)
-
-# Load and save settings config
-def load_config():
-    try:
-        if not os.path.exists(CONFIG_PATH): 
-            raise FileNotFoundError("Config file not found.")
-        
-        with open(CONFIG_PATH, "r") as file:
-            config = json.load(file)
-
-        if "key_bindings" not in config:
-            raise KeyError("Key bindings not found in config.")
-
-        for player in config["key_bindings"]:
-            for action in config["key_bindings"][player]:
-                key_str = config["key_bindings"][player][action]
-                if isinstance(key_str, str): # Only convert if it's a string
-                    try:
-                        config["key_bindings"][player][action] = getattr(pygame, key_str)
-                    except AttributeError:
-                        raise ValueError(f"Invalid key binding: {key_str} for {player} - {action}")
-        return config
-
-    except FileNotFoundError as e:
-        print(f"Error: {e}")
-    except json.JSONDecodeError as e:
-        print(f"Error decoding JSON: {e}")
-    except (KeyError, ValueError) as e:
-        print(f"Error in config structure: {e}")
-    except Exception as e:
-        print(f"An unexpected error occurred: {e}")
-    
-    return None
-    
-def save_config(settings):
-    try:
-        if not os.path.exists(CONFIG_PATH):
-            raise FileNotFoundError("Config file not found.")
-        
-        with open(CONFIG_PATH, "w") as file:
-            json.dump(settings, file, indent=4)
-    
-    except FileNotFoundError as e:
-        print(f"Error: {e}")
-    except json.JSONDecodeError as e:
-        print(f"Error decoding JSON: {e}")
-    except Exception as e:
-        print(f"An unexpected error occurred: {e}")
-
-class BackgroundSnake:
-    def __init__(self, screen):
-        self.screen = screen
-        self.position = [random.randint(0, 800), random.randint(0, 600)]
-        self.velocity = [random.choice([-1, 1]), random.choice([-1, 1])]
-        self.length = random.randint(5, 45)
-        self.body = [self.position[:]] * self.length
-        self.color = (random.randint(0, 255), random.randint(0, 255), random.randint(0, 255))
+PROGRESS_COLOR = (93, 216, 228)
+
+DEMO_SNAKES = 5
+DEMO_CELL_SIZE = 10  # smallest cell, larger windows get larger cells
+DEMO_MAX_BOARD = (64, 36)  # the gameplay board, keeps autopilot searches cheap
+DEMO_STEP_FRAMES = 3  # menu frames per move of the backdrop snakes
+DEMO_SEARCHES = 2  # path searches per move, a full one is about 2 ms on the largest board
+
+WINDOW_SIZES = [
+    [640, 480],
+    [800, 600],
+    [1024, 768],
+    [1280, 720],
+    [1366, 768],
+    [1600, 900],
+    [1920, 1080]
+]
+
+
+class BackgroundSnakes:
+    # Menu backdrop: a few autopilot snakes playing on a board that covers the window
+    def __init__(self, size, seed, count=DEMO_SNAKES):
+        self.size = tuple(size)
+        self.cell_size = max(DEMO_CELL_SIZE, -(-size[0] // DEMO_MAX_BOARD[0]), -(-size[1] // DEMO_MAX_BOARD[1]))
+        self.engine = Engine(count, size[0] // self.cell_size, size[1] // self.cell_size, seed)
+        self.autopilots = [Autopilot(self.engine, i) for i in range(count)]
+        self.frame = 0
+        self.tiles = {}
 
     def move(self):
-        self.position[0] += self.velocity[0] * 3
-        self.position[1] += self.velocity[1] * 3
-
-        width, height = self.screen.get_size()
-        if self.position[0] <= 0 or self.position[0] >= width:
-            self.velocity[0] *= -1
-        if self.position[1] <= 0 or self.position[1] >= height:
-            self.velocity[1] *= -1
-        
-        self.body.insert(0, list(self.position))
-        self.body = self.body[:self.length]  # Keep only the last 5 positions
-    
-    def draw(self):
-        for segment in self.body:
-            pygame.draw.rect(self.screen, self.color, (*segment, 10, 10))
+        self.frame += 1
+        if self.frame % DEMO_STEP_FRAMES:
+            return
+        # When the food is eaten every snake wants a new path, the ones over
+        # the search budget take their fallback move and search next time.
+        # The snake asked first rotates so none is always left out.
+        count = len(self.autopilots)
+        actions = [None] * count
+        searches = DEMO_SEARCHES
+        for k in range(count):
+            pilot = self.autopilots[(self.engine.tick + k) % count]
+            before = pilot.searches
+            actions[pilot.index] = pilot.action(searches > 0)
+            searches -= pilot.searches - before
+        for event in self.engine.step(actions):
+            if event[0] == "death":
+                self.engine.reset_snake(event[1])
+
+    def tile(self, color):
+        tile = self.tiles.get(color)
+        if tile is None:
+            tile = pygame.Surface((self.cell_size, self.cell_size)).convert()
+            tile.fill(color)
+            self.tiles[color] = tile
+        return tile
+
+    def draw(self, screen):
+        width = self.engine.width
+        cell_size = self.cell_size
+        blits = []
+        for food in self.engine.foods:
+            y, x = divmod(food.cell, width)
+            blits.append((self.tile(food.color), (x * cell_size, y * cell_size)))
+        for snake in self.engine.snakes:
+            tile = self.tile(snake.color)
+            for cell in snake.cells():
+                y, x = divmod(cell, width)
+                blits.append((tile, (x * cell_size, y * cell_size)))
+        screen.blits(blits, doreturn=False)
 
 class Button:
     def __init__(self, text, font, x, y, width, height, callback=None):
@@ -103,16 +108,14 @@ class Button:
     def draw(self, screen, mouse_pos):
         color = BUTTON_HOVER_COLOR if self.rect.collidepoint(mouse_pos) else BUTTON_COLOR
         pygame.draw.rect(screen, color, self.rect)
-        text_surface = self.font.render(self.text, True, TEXT_COLOR)
+        text_surface = render_text(self.font, self.text, TEXT_COLOR)
         text_rect = text_surface.get_rect(center=self.rect.center)
         screen.blit(text_surface, text_rect)
     
     def handle_event(self, event):
         if event.type == pygame.MOUSEBUTTONDOWN and self.rect.collidepoint(event.pos):
             if self.callback:
-                sound = pygame.mixer.Sound("resources/sounds/fruit.wav")
-                sound.set_volume(load_config()["sound_effects_volume"])
-                sound.play()
+                audio.play("fruit")
                 self.callback()
 
 class CircleButtons:
@@ -133,9 +136,7 @@ class CircleButtons:
         
     def handle_event(self, event):
         if event.type == pygame.MOUSEBUTTONDOWN and self.rect.collidepoint(event.pos):
-            sound = pygame.mixer.Sound("resources/sounds/fruit.wav")
-            sound.set_volume(load_config()["sound_effects_volume"])
-            sound.play()
+            audio.play("fruit")
             self.action()
 
 class KeyBindings:
@@ -185,7 +186,7 @@ class KeyBindings:
         self.screen_width, self.screen_height = self.config["window_size"]
         self.scale = max(0.8, min(2.0, self.screen_width / 800))
         font_size = max(16, int(20 * self.scale))
-        self.font = pygame.font.Font(self.font_path, font_size)
+        self.font = get_font(self.font_path, font_size)
 
         # Resize back button
         self.back_button.font = self.font
@@ -199,8 +200,8 @@ class KeyBindings:
 
         # Title
         title_font_size = int(30 * self.scale)
-        self.title_font = pygame.font.Font(self.font_path, title_font_size)
-        self.title_surface = self.title_font.render("Key Bindings", True, TEXT_COLOR)
+        self.title_font = get_font(self.font_path, title_font_size)
+        self.title_surface = render_text(self.title_font, "Key Bindings", TEXT_COLOR)
         self.title_rect = self.title_surface.get_rect(center=(self.screen_width // 2, int(50 * self.scale)))
 
         self.box_height = int(40 * self.scale)
@@ -220,7 +221,7 @@ class KeyBindings:
             new_key = event.key
             self.config["key_bindings"][player][action] = new_key
             self.key_buttons[(player, action)].text = self.format_key(new_key)
-            save_config(self.config)
+            self.config.save()  # nested edit, not seen by __setitem__
             self.key_pressed = None
 
     def format_label(self, text):
@@ -238,13 +239,13 @@ class KeyBindings:
         mouse_pos = pygame.mouse.get_pos()
 
         for player in ["player1", "player2"]:
-            header = self.font.render(player.capitalize(), True, TEXT_COLOR)
+            header = render_text(self.font, player.capitalize(), TEXT_COLOR)
             header_rect = header.get_rect(topleft=(int(50 * self.scale), y_offset))
             self.screen.blit(header, header_rect)
             y_offset += self.box_height + int(30 * self.scale)
 
             for action, key in self.config["key_bindings"][player].items():
-                label_surface = self.font.render(self.format_label(action), True, TEXT_COLOR)
+                label_surface = render_text(self.font, self.format_label(action), TEXT_COLOR)
                 label_rect = label_surface.get_rect()
                 label_rect.right = self.screen_width // 2 - int(20 * self.scale)  # leave gap before button
                 label_rect.top = y_offset
@@ -276,15 +277,7 @@ class SettingsMenu:
         self.settings = main.settings
         self.font = main.font
         self.title_font = main.title_font
-        self.window_sizes = [
-            [640, 480],
-            [800, 600],
-            [1024, 768],
-            [1280, 720],
-            [1366, 768],
-            [1600, 900],
-            [1920, 1080]
-        ]
+        self.window_sizes = WINDOW_SIZES
 
         self.button_action = {
             "music_minus": (self.decrease_music_volume, False),
@@ -312,8 +305,8 @@ class SettingsMenu:
         scale = max(0.8, min(2, width / 800))  # Scale based on window width
         font_size = max(16, min(int(20 * scale), 28))
         title_font_size = max(20, int(32 * scale))
-        self.font = pygame.font.Font(FONT_PATH, font_size)
-        self.title_font = pygame.font.Font(FONT_PATH, title_font_size)
+        self.font = get_font(FONT_PATH, font_size)
+        self.title_font = get_font(FONT_PATH, title_font_size)
 
         y_start = int(150 * scale)
         gap = int(90 * scale)
@@ -322,7 +315,7 @@ class SettingsMenu:
         button_offset = int(35 * scale)
 
         if self.scroll_offset == 0:
-            title_surface = self.title_font.render("Settings", True, TEXT_COLOR)
+            title_surface = render_text(self.title_font, "Settings", TEXT_COLOR)
             screen.blit(title_surface, title_surface.get_rect(center=(cx, int(80 * scale))))
 
         labels = [
@@ -341,8 +334,8 @@ class SettingsMenu:
         for i, (label, value) in enumerate(zip(labels, values)):
             y = row_y(i)
             if not(y < -gap or y > height + gap):
-                label_surface = self.font.render(label, True, TEXT_COLOR)
-                value_surface = self.font.render(value, True, TEXT_COLOR)
+                label_surface = render_text(self.font, label, TEXT_COLOR)
+                value_surface = render_text(self.font, value, TEXT_COLOR)
                 screen.blit(label_surface, (cx - label_offset_table[i], y + label_offset ))
                 screen.blit(value_surface, value_surface.get_rect(center=(cx, y + value_offset)))
         
@@ -425,33 +418,24 @@ class SettingsMenu:
     
     def apply_window_size(self):
         self.main.screen = pygame.display.set_mode(self.settings["window_size"])
-        save_config(self.settings)
     
     def increase_music_volume(self):
         self.settings["music_volume"] = min(self.settings["music_volume"] + 0.1, 1.0)
-        pygame.mixer.music.set_volume(self.settings["music_volume"])
-        save_config(self.settings)
     
     def decrease_music_volume(self):
         self.settings["music_volume"] = max(self.settings["music_volume"] - 0.1, 0.0)
-        pygame.mixer.music.set_volume(self.settings["music_volume"])
-        save_config(self.settings)
     
     def increase_sounds_volume(self):
         self.settings["sound_effects_volume"] = min(self.settings["sound_effects_volume"] + 0.1, 1.0)
-        save_config(self.settings)
 
     def decrease_sounds_volume(self):
         self.settings["sound_effects_volume"] = max(self.settings["sound_effects_volume"] - 0.1, 0.0)
-        save_config(self.settings)
 
     def increase_speed(self):
         self.settings["game_speed"] = min(self.settings["game_speed"] + 0.1, 4.0)
-        save_config(self.settings)
 
     def decrease_speed(self):
         self.settings["game_speed"] = max(self.settings["game_speed"] - 0.1, 0.1)
-        save_config(self.settings)
 
     def open_key_bindings(self):
         self.main.in_settings = False
@@ -461,17 +445,28 @@ class SettingsMenu:
         self.main.in_settings = False
 
 class Main:
-    def __init__(self):
-        pygame.init()
-        self.settings = load_config()
+    def __init__(self, seed=None, startup_profile=None, cpu_player=None):
+        # Only what the first menu frame needs, the rest is left to self.loader
+        self.startup_profile = startup_profile
+        if startup_profile is not None:
+            startup_profile.mark("imports")
+        pygame.display.init()
+        pygame.font.init()
+        # Games get this seed, the menu's own cosmetics use a separate stream
+        self.seed = seed
+        self.cpu_player = cpu_player
+        self.random = random.Random(seed)
+        self.settings = get_settings()
         self.screen = pygame.display.set_mode(self.settings["window_size"], 0, 32)
         pygame.display.set_caption("Greedy Snake")
         self.clock = pygame.time.Clock()
+        if startup_profile is not None:
+            startup_profile.mark("window open")
 
-        self.font = pygame.font.Font(FONT_PATH, 20)
-        self.title_font = pygame.font.Font(FONT_PATH, 32)
+        self.font = get_font(FONT_PATH, 20)
+        self.title_font = get_font(FONT_PATH, 32)
 
-        self.snakes = [BackgroundSnake(self.screen) for _ in range(5)]
+        self.background = BackgroundSnakes(self.screen.get_size(), self.random.getrandbits(32))
         self.buttons = []
         self.in_settings = False
         self.in_key_bindings = False
@@ -480,23 +475,57 @@ class Main:
 
         self.in_game = False
         self.game_screen = None
+        self.layout_size = None
+        self.gradient = None
+
+        self.loader = AssetLoader()
+        self.loader.add("audio device", self.init_audio)
+        for name in SOUND_NAMES:
+            self.loader.add(f"sound {name}", lambda name=name: audio.sound(name))
+        self.loader.add("music", audio.play_music)
+        self.loader.add("game modules", self.load_game)
+        self.loader.start()
+        profiler.set_enabled(self.settings.get("perf_hud", False))
+        
+        self.create_buttons()
+
 
+    def init_audio(self):
         pygame.mixer.init()
-        self.death_sound = pygame.mixer.Sound("resources/sounds/death.wav")
-        self.shift_sound = pygame.mixer.Sound("resources/sounds/shift.wav")
-        self.eat_sound = pygame.mixer.Sound("resources/sounds/fruit.wav")
-        self.buff_sound = pygame.mixer.Sound("resources/sounds/buff.wav")
-        self.debuff_sound = pygame.mixer.Sound("resources/sounds/debuff.wav")
+        audio.bind(self.settings)
 
-        try:
-            pygame.mixer.music.load("resources/music.mp3")
-            pygame.mixer.music.set_volume(self.settings["music_volume"])
-            pygame.mixer.music.play(-1)
-        except pygame.error as e:
-            print("Failed to load music:", e)
-        
-        self.create_buttons()
+    def load_game(self):
+        import snake
+        load_background(snake.BACKGROUND_PATH, (snake.SCREEN_WIDTH, snake.SCREEN_HEIGHT))
 
+    def draw_progress(self, progress):
+        # Thin bar along the bottom edge with the job being loaded
+        width, height = self.settings["window_size"]
+        bar = pygame.Rect(0, height - 6, int(width * progress), 6)
+        pygame.draw.rect(self.screen, PROGRESS_COLOR, bar)
+        label = render_text(get_font(FONT_PATH, 12), f"Loading {self.loader.current or ''}", TEXT_COLOR)
+        self.screen.blit(label, (8, height - 10 - label.get_height()))
+
+    def draw_loading_screen(self, progress):
+        self.draw_gradient_background()
+        self.draw_title()
+        self.draw_progress(progress)
+        pygame.display.flip()
+
+    def wait_for_assets(self):
+        if not self.loader.finished:
+            if not self.loader.wait(self.draw_loading_screen, self.clock):
+                self.exit_game()
+
+    def update_startup_profile(self):
+        # Called after every presented menu frame until the report is out
+        profile = self.startup_profile
+        if len(profile.marks) == 2:
+            profile.mark("first frame")
+        if self.loader.finished:
+            profile.mark("assets loaded", self.loader.finished_at)
+            profile.report(self.loader)
+            self.startup_profile = None
     
     def create_buttons(self):
         self.buttons = []
@@ -511,17 +540,23 @@ class Main:
         self.buttons.append(Button("Settings", self.font, x, y_start + 2 * gap, total_button_width, height, self.open_settings))
         self.buttons.append(Button("Exit", self.font, x, y_start + 3 * gap, total_button_width, height, self.exit_game))
 
-    def draw_gradient_background(self):
-        width, height = self.settings["window_size"]
+    def build_gradient(self, width, height):
+        # One pixel wide column, stretched to the window width
+        column = pygame.Surface((1, height)).convert()
         for y in range(height):
             ratio = y / height
-            r = int(48 * (1 - ratio) + 16 * ratio)
-            g = int(25 * (1 - ratio) + 8 * ratio)
-            b = int(52 * (1 - ratio) + 32 * ratio)
-            pygame.draw.line(self.screen, (r, g, b), (0, y), (width, y))
+            color = [int(start * (1 - ratio) + end * ratio) for start, end in zip(BACKGROUND_START, BACKGROUND_END)]
+            column.set_at((0, y), color)
+        return pygame.transform.scale(column, (width, height))
+
+    def draw_gradient_background(self):
+        size = tuple(self.settings["window_size"])
+        if self.gradient is None or self.gradient.get_size() != size:
+            self.gradient = self.build_gradient(*size)
+        self.screen.blit(self.gradient, (0, 0))
     
     def draw_title(self):
-        title_surface = self.title_font.render("Greedy Snake", True, TEXT_COLOR)
+        title_surface = render_text(self.title_font, "Greedy Snake", TEXT_COLOR)
         title_rect = title_surface.get_rect(center=(self.settings["window_size"][0] // 2, 100))
         self.screen.blit(title_surface, title_rect)
 
@@ -529,31 +564,38 @@ class Main:
         self.in_settings = True
 
     def start_singleplayer(self):
+        self.wait_for_assets()
         from snake import SinglePlayerGame
         print("Starting singleplayer mode...")
         self.in_game = True
-        game = SinglePlayerGame(self.screen)
+        game = SinglePlayerGame(self.screen, seed=self.seed)
         game.run()
         self.in_game = False
 
 
     def start_multiplayer(self):
+        self.wait_for_assets()
         from snake import MultiPlayerGame
         print("Starting multiplayer mode...")
         self.in_game = True
-        game = MultiPlayerGame(self.screen)
+        game = MultiPlayerGame(self.screen, seed=self.seed, cpu_player=self.cpu_player)
         game.run()
         self.in_game = False
     
     def exit_game(self):
         print("Exiting game...")
+        self.settings.flush()
+        profiler.stop_trace()
         pygame.quit()
         sys.exit()
     
-    def handle_events(self):
-        for event in pygame.event.get():
+    def handle_events(self, events):
+        for event in events:
             if event.type == pygame.QUIT:
                 self.exit_game()
+            elif event.type == pygame.KEYDOWN and event.key == TOGGLE_KEY:
+                self.settings["perf_hud"] = not profiler.enabled
+                profiler.set_enabled(self.settings["perf_hud"])
 
             if self.in_settings:
                 self.settings_menu.handle_event(event)
@@ -565,9 +607,10 @@ class Main:
     
     def update_button_positions(self):
         width, height = self.settings["window_size"]
+        self.layout_size = (width, height)
         scale = width / 800  # Assuming 800 is the base width for button scaling
         font_size = max(16, int(20 * scale))
-        self.font = pygame.font.Font(FONT_PATH, font_size)
+        self.font = get_font(FONT_PATH, font_size)
 
         btn_width = int(250 * scale)
         btn_height = int(50 * scale)
@@ -580,10 +623,35 @@ class Main:
         for button in self.buttons:
             button.font = self.font
 
+    def current_scene(self):
+        if self.in_settings:
+            return "Settings menu"
+        elif self.in_key_bindings:
+            return "Key bindings menu"
+        return None  # animated main menu
+
     def run(self):
+        scene = None
+        meter = None
         while True:
-            self.handle_events()
-            self.screen.fill((0, 0, 0))
+            profiler.frame()
+            if self.current_scene() != scene:
+                if meter:
+                    meter.report()
+                scene = self.current_scene()
+                meter = IdleMeter(scene) if scene else None
+                events = pygame.event.get()
+            elif scene:
+                # Static menus only repaint when something happened
+                events = wait_events()
+                if not events:
+                    continue
+            else:
+                events = pygame.event.get()
+            profiler.mark("wait")
+
+            self.handle_events(events)
+            profiler.mark("events")
             self.draw_gradient_background()
 
             if self.in_settings:
@@ -592,22 +660,51 @@ class Main:
                 self.key_bindings_menu.draw()
             else:
                 self.draw_title()
+                profiler.mark("draw")
 
-                for snake in self.snakes:
-                    snake.move()
-                    snake.draw()
+                if self.background.size != self.screen.get_size():
+                    self.background = BackgroundSnakes(self.screen.get_size(), self.random.getrandbits(32))
+                self.background.move()
+                profiler.mark("sim")
+                self.background.draw(self.screen)
 
+                if self.layout_size != tuple(self.settings["window_size"]):
+                    self.update_button_positions()
                 mouse_pos = pygame.mouse.get_pos()
                 for button in self.buttons:
                     button.draw(self.screen, mouse_pos)
-                self.update_button_positions()
 
+            if not self.loader.finished:
+                self.draw_progress(self.loader.progress())
+            if profiler.enabled:
+                self.screen.blit(profiler.overlay(), profiler.overlay_pos(self.screen))
+            profiler.mark("draw")
             pygame.display.flip()
-            self.clock.tick(60)
+            profiler.mark("present")
+            if self.startup_profile is not None:
+                self.update_startup_profile()
+            if not scene:
+                self.clock.tick(60)
+                profiler.mark("wait")
+
+def seed_arg(value):
+    seed = int(value)
+    if seed < 0:
+        raise argparse.ArgumentTypeError("seed must be a non-negative integer")
+    return seed
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Greedy Snake")
+    parser.add_argument("--seed", type=seed_arg, default=None, help="fixed seed for reproducible games")
+    parser.add_argument("--trace", metavar="PATH", help="write frame phase timings as a Trace Event JSON file")
+    parser.add_argument("--cpu-player", action="store_true", default=None, help="player 2 is driven by the autopilot")
+    parser.add_argument("--startup-profile", action="store_true", help="report time to first frame and asset loading times")
+    args = parser.parse_args()
+    if args.trace:
+        profiler.start_trace(args.trace)
     try:
-        main_game = Main()
+        main_game = Main(seed=args.seed, startup_profile=StartupProfile(START_TIME) if args.startup_profile else None,
+                         cpu_player=args.cpu_player)
         main_game.run()
     except FileNotFoundError as e:
         print(f"Error: {e}")
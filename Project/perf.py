@@ -0,0 +1,143 @@
+import time
+import atexit
+import pygame
+from array import array
+from assets import render_text, get_font
+from tracing import Tracer
+
+# Frame profiler and the F3 performance overlay.
+#
+# Loops call profiler.frame() once per iteration and profiler.mark(phase)
+# after each section, the time since the previous mark is charged to that
+# phase. While neither the overlay nor a trace is on both return straight
+# away, so the instrumentation can stay in the hot loops.
+
+TOGGLE_KEY = pygame.K_F3
+
+PHASES = ["wait", "events", "sim", "collide", "spawn", "draw", "present"]
+HISTORY = 120  # frames in the frame time graph
+SMOOTHING = 0.05  # weight of the newest frame in the per-phase averages
+TEXT_INTERVAL = 0.25  # seconds between refreshes of the numbers
+
+OVERLAY_SIZE = (230, 190)
+OVERLAY_BACKGROUND = (0, 0, 0, 170)
+OVERLAY_TEXT_COLOR = (230, 230, 230)
+GRAPH_COLOR = (90, 220, 120)
+GRAPH_BUDGET_COLOR = (220, 90, 90)
+GRAPH_SCALE = 1 / 0.05  # the graph is 50 ms tall
+
+
+class FrameProfiler:
+    def __init__(self, history=HISTORY):
+        self.enabled = False  # overlay shown
+        self.tracer = None
+        self.active = False  # overlay or trace, anything to collect for
+        self.frame_times = array("d", bytes(8 * history))
+        self.frame_index = 0
+        self.phases = dict.fromkeys(PHASES, 0.0)  # smoothed seconds per frame
+        self.current = dict.fromkeys(PHASES, 0.0)
+        self.frame_time = 0.0
+        self.tick_rate = 0.0
+        self.frame_start = None
+        self.last = 0.0
+        self.lines = []
+        self.lines_time = 0.0
+        self.surface = None
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        self.active = enabled or self.tracer is not None
+        self.reset()
+
+    def start_trace(self, path):
+        self.tracer = Tracer(path, PHASES + ["frame"], complete=["frame"])
+        atexit.register(self.stop_trace)
+        self.set_enabled(self.enabled)
+
+    def stop_trace(self):
+        if self.tracer is not None:
+            self.tracer.close()
+            self.tracer = None
+            self.set_enabled(self.enabled)
+
+    def reset(self):
+        # Starts a fresh measurement, e.g. when a loop is entered
+        self.frame_start = None
+        for name in self.current:
+            self.current[name] = 0.0
+
+    def frame(self, ticks=0):
+        # Closes the previous frame. ticks: logic ticks it ran.
+        if not self.active:
+            return
+        now = time.perf_counter()
+        if self.frame_start is not None:
+            if self.tracer is not None:
+                self.tracer.record("frame", self.frame_start, now)
+            elapsed = now - self.frame_start
+            self.frame_times[self.frame_index] = elapsed
+            self.frame_index = (self.frame_index + 1) % len(self.frame_times)
+            self.frame_time += (elapsed - self.frame_time) * SMOOTHING
+            self.tick_rate += (ticks / elapsed - self.tick_rate) * SMOOTHING if elapsed > 0 else 0
+            phases, current = self.phases, self.current
+            for name in phases:
+                phases[name] += (current[name] - phases[name]) * SMOOTHING
+                current[name] = 0.0
+        self.frame_start = self.last = now
+
+    def mark(self, phase):
+        if not self.active:
+            return
+        now = time.perf_counter()
+        self.current[phase] += now - self.last
+        if self.tracer is not None:
+            self.tracer.record(phase, self.last, now)
+        self.last = now
+
+    def text_lines(self):
+        fps = 1 / self.frame_time if self.frame_time > 0 else 0.0
+        lines = [f"FPS {fps:5.1f}  frame {self.frame_time * 1000:5.2f} ms",
+                 f"ticks/s {self.tick_rate:5.1f}"]
+        for name in PHASES:
+            lines.append(f"{name:<8} {self.phases[name] * 1000:6.3f} ms")
+        return lines
+
+    def overlay(self):
+        # The overlay surface, rebuilt every frame for the graph. The numbers
+        # only change a few times a second so they stay readable and the text
+        # cache is not flooded.
+        if self.surface is None:
+            self.surface = pygame.Surface(OVERLAY_SIZE, pygame.SRCALPHA)
+        surface = self.surface
+        surface.fill(OVERLAY_BACKGROUND)
+
+        now = time.perf_counter()
+        if now - self.lines_time >= TEXT_INTERVAL:
+            self.lines = self.text_lines()
+            self.lines_time = now
+        font = get_font(None, 16)
+        y = 4
+        for line in self.lines:
+            surface.blit(render_text(font, line, OVERLAY_TEXT_COLOR), (6, y))
+            y += 14
+
+        width, height = OVERLAY_SIZE
+        top = y + 4
+        graph_height = height - top - 4
+        budget_y = height - 4 - min(graph_height, int(graph_height * GRAPH_SCALE / 60))
+        pygame.draw.line(surface, GRAPH_BUDGET_COLOR, (6, budget_y), (width - 6, budget_y))
+
+        count = len(self.frame_times)
+        step = (width - 12) / (count - 1)
+        points = []
+        for i in range(count):
+            value = self.frame_times[(self.frame_index + i) % count]
+            points.append((6 + i * step, height - 4 - min(graph_height, value * GRAPH_SCALE * graph_height)))
+        pygame.draw.lines(surface, GRAPH_COLOR, False, points)
+        return surface
+
+    def overlay_pos(self, screen):
+        return (screen.get_width() - OVERLAY_SIZE[0] - 5, 5)
+
+
+profiler = FrameProfiler()
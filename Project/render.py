@@ -0,0 +1,224 @@
+import pygame
+from assets import render_text
+
+OUTLINE_COLOR = (93, 216, 228)
+GRID_LINE_COLOR = (255, 255, 255, 10)
+
+_static_layers = {}
+_backgrounds = {}
+_tiles = {}
+
+
+def draw_segment(surface, rect, color):
+    pygame.draw.rect(surface, color, rect)
+    pygame.draw.rect(surface, OUTLINE_COLOR, rect, 1)
+
+def draw_food(surface, food, rect):
+    if food.kind == "fruit":
+        radius = rect.width // 2 - 2
+        pygame.draw.circle(surface, food.color, rect.center, radius)
+        pygame.draw.circle(surface, OUTLINE_COLOR, rect.center, radius, 1)
+    else:
+        draw_segment(surface, rect, food.color)
+
+def segment_tile(color, cell_size):
+    key = ("segment", color, cell_size)
+    tile = _tiles.get(key)
+    if tile is None:
+        tile = pygame.Surface((cell_size, cell_size)).convert()
+        draw_segment(tile, tile.get_rect(), color)
+        _tiles[key] = tile
+    return tile
+
+def food_tile(food, cell_size):
+    key = (food.kind, food.color, cell_size)
+    tile = _tiles.get(key)
+    if tile is None:
+        # Round fruit needs the background to show through its corners
+        tile = pygame.Surface((cell_size, cell_size), pygame.SRCALPHA)
+        draw_food(tile, food, tile.get_rect())
+        tile = tile.convert_alpha()
+        _tiles[key] = tile
+    return tile
+
+def blit_batch(surface, sequence):
+    # One C-level call for a whole list of (source, dest[, area]) blits
+    surface.blits(sequence, doreturn=False)
+
+
+def draw_grid(surface, cell_size):
+    surface.fill((0,0,0,0))
+    width, height = surface.get_size()
+
+    for x in range(0, width, cell_size):
+        pygame.draw.line(surface, GRID_LINE_COLOR, (x, 0), (x, height))
+
+    # Draw horizontal lines
+    for y in range(0, height, cell_size):
+        pygame.draw.line(surface, GRID_LINE_COLOR, (0, y), (width, y))
+
+def load_background(path, world_size):
+    # Decoded and scaled background image. Does not need the display, so the
+    # start-up loader can prepare it on its thread.
+    key = (path, tuple(world_size))
+    image = _backgrounds.get(key)
+    if image is None:
+        image = pygame.transform.scale(pygame.image.load(path), world_size)
+        _backgrounds[key] = image
+    return image
+
+def static_layer(size, background_path, world_size, cell_size):
+    # Background image with the grid already blended in, in the display pixel
+    # format. Built once and reused until the window size or background changes.
+    key = (tuple(size), background_path, tuple(world_size), cell_size)
+    layer = _static_layers.get(key)
+    if layer is not None:
+        return layer
+
+    background = load_background(background_path, world_size)
+    grid_surface = pygame.Surface(world_size, pygame.SRCALPHA)
+    draw_grid(grid_surface, cell_size)
+
+    layer = pygame.Surface(size).convert()
+    layer.blit(background, (0, 0))
+    layer.blit(grid_surface, (0, 0))
+
+    _static_layers.clear()
+    _static_layers[key] = layer
+    return layer
+
+
+class GameRenderer:
+    # Dirty-rectangle renderer for the gameplay screen.
+    #
+    # The world is kept in a back buffer. Each frame only the cells the
+    # engine reports as changed (new heads, released tails, eaten and
+    # spawned food) are restored from the static layer and redrawn, and
+    # only those rects plus the HUD labels are pushed to the display.
+    def __init__(self, screen, static, cell_size, font, text_color):
+        self.screen = screen
+        self.static = static
+        self.cell_size = cell_size
+        self.font = font
+        self.text_color = text_color
+        self.world = static.copy()
+        self.engine = None
+        self.hud = []  # [(text, rect)] drawn last frame
+        self.overlay_rect = None
+        self.full = True
+
+    def attach(self, engine):
+        self.engine = engine
+        engine.grid.dirty = []
+        self.invalidate()
+
+    def invalidate(self):
+        # Next frame repaints everything, e.g. after an overlay covered the screen
+        self.full = True
+
+    def cell_rect(self, cell):
+        x, y = self.engine.grid.position(cell)
+        return pygame.Rect(x * self.cell_size, y * self.cell_size, self.cell_size, self.cell_size)
+
+    def cell_pos(self, cell):
+        y, x = divmod(cell, self.engine.grid.width)
+        return (x * self.cell_size, y * self.cell_size)
+
+    def redraw_world(self):
+        engine = self.engine
+        cell_size = self.cell_size
+        self.world.blit(self.static, (0, 0))
+        blit_batch(self.world, [(food_tile(food, cell_size), self.cell_pos(food.cell)) for food in engine.foods])
+        for snake in engine.snakes:
+            tile = segment_tile(snake.color, cell_size)
+            blit_batch(self.world, [(tile, self.cell_pos(cell)) for cell in snake.cells()])
+        engine.grid.dirty.clear()
+
+    def update_cells(self):
+        engine = self.engine
+        grid = engine.grid
+        if not grid.dirty:
+            return []
+
+        cell_size = self.cell_size
+        heads = {snake.head_cell(): snake.color for snake in engine.snakes}
+        rects = []
+        tiles = []
+        for cell in set(grid.dirty):
+            rect = self.cell_rect(cell)
+            rects.append(rect)
+            if grid.food[cell]:
+                for food in engine.foods:
+                    if food.cell == cell:
+                        tiles.append((food_tile(food, cell_size), rect))
+                        break
+            elif grid.cells[cell] == 1 and cell in heads:
+                tiles.append((segment_tile(heads[cell], cell_size), rect))
+            elif grid.cells[cell]:
+                # Overlapping snakes, e.g. a respawn inside another body. Rare, so
+                # just look up the topmost owner, the last snake drawn wins.
+                color = next(s.color for s in reversed(engine.snakes) if cell in s.cells())
+                tiles.append((segment_tile(color, cell_size), rect))
+        grid.dirty.clear()
+
+        blit_batch(self.world, [(self.static, rect, rect) for rect in rects])
+        blit_batch(self.world, tiles)
+        return rects
+
+    def draw_hud(self, lines, world_rects):
+        # lines: [(text, topleft)]. Labels are repainted only when their text
+        # changed or the world underneath them was redrawn.
+        texts = [text for text, _ in self.hud]
+        old_rects = [rect for _, rect in self.hud]
+        if not self.full and texts == [text for text, _ in lines] and \
+                not any(r.collidelist(old_rects) != -1 for r in world_rects):
+            return []
+
+        for rect in old_rects:
+            self.screen.blit(self.world, rect, rect)
+        self.hud = []
+        for text, pos in lines:
+            surface = render_text(self.font, text, self.text_color)
+            rect = self.screen.blit(surface, pos)
+            self.hud.append((text, rect))
+        return old_rects + [rect for _, rect in self.hud]
+
+    def draw_overlay(self, overlay):
+        # overlay: (surface, topleft) or None. It changes every frame, so the
+        # previous one is wiped and the new one drawn on top of everything.
+        rects = []
+        if self.overlay_rect is not None:
+            self.screen.blit(self.world, self.overlay_rect, self.overlay_rect)
+            rects.append(self.overlay_rect)
+            self.overlay_rect = None
+        if overlay is not None:
+            self.overlay_rect = self.screen.blit(*overlay)
+            rects.append(self.overlay_rect)
+        return rects
+
+    def render(self, hud_lines, overlay=None):
+        # Brings the screen surface up to date, returns the rects to present,
+        # None when the whole display has to be updated
+        if self.full:
+            self.redraw_world()
+            self.screen.blit(self.world, (0, 0))
+            self.draw_hud(hud_lines, [])
+            self.overlay_rect = None
+            self.draw_overlay(overlay)
+            self.full = False
+            return None
+
+        rects = self.update_cells()
+        blit_batch(self.screen, [(self.world, rect, rect) for rect in rects])
+        rects += self.draw_hud(hud_lines, rects)
+        rects += self.draw_overlay(overlay)
+        return rects
+
+    def present(self, rects):
+        if rects is None:
+            pygame.display.update()
+        elif rects:
+            pygame.display.update(rects)
+
+    def draw(self, hud_lines, overlay=None):
+        self.present(self.render(hud_lines, overlay))
@@ -0,0 +1,200 @@
+import sys
+import time
+import argparse
+from engine import Engine
+
+# Compact replays: the engine is deterministic for a given seed, so a
+# session is stored as its seed plus the sequence of engine calls.
+#
+# File layout, all integers as unsigned LEB128 varints:
+#   b"SNKR", version, players, width, height, seed, game speed * 100
+#   entries until EOF:
+#     (run << 1)        followed by one action byte per two players,
+#                       that step repeated run times
+#     (index << 1) | 1  reset_snake(index)
+#
+# Each player's action is a nibble, 0xF meaning the snake was not
+# scheduled to move that step. Idle stretches collapse into a single run
+# entry, so a session costs a few bytes per second. Version 1 files have
+# no game speed and play back at the current setting.
+
+MAGIC = b"SNKR"
+VERSION = 2
+NOT_MOVING = 0xF
+
+
+def write_varint(out, value):
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return
+
+def read_varint(data, pos):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+def pack_actions(actions):
+    packed = bytearray((len(actions) + 1) // 2)
+    for i, action in enumerate(actions):
+        nibble = NOT_MOVING if action is None else action
+        packed[i // 2] |= nibble << (4 * (i % 2))
+    return bytes(packed)
+
+def unpack_actions(packed, players):
+    actions = []
+    for i in range(players):
+        nibble = (packed[i // 2] >> (4 * (i % 2))) & 0xF
+        actions.append(None if nibble == NOT_MOVING else nibble)
+    return actions
+
+
+class ReplayRecorder:
+    # Attached to an engine as engine.recorder, sees every step and reset
+    def __init__(self, engine, game_speed=1.0):
+        if engine.seed < 0:
+            raise ValueError("Replays need a non-negative seed")
+        self.data = bytearray(MAGIC)
+        for value in (VERSION, engine.players, engine.width, engine.height, engine.seed, round(game_speed * 100)):
+            write_varint(self.data, value)
+        self.run_actions = None
+        self.run_length = 0
+        self.ticks = 0
+        engine.recorder = self
+
+    def record_step(self, actions):
+        packed = pack_actions(actions)
+        if packed != self.run_actions:
+            self.flush_run()
+            self.run_actions = packed
+        self.run_length += 1
+        self.ticks += 1
+
+    def record_reset(self, index):
+        self.flush_run()
+        write_varint(self.data, (index << 1) | 1)
+
+    def flush_run(self):
+        if self.run_length:
+            write_varint(self.data, self.run_length << 1)
+            self.data += self.run_actions
+        self.run_actions = None
+        self.run_length = 0
+
+    def getvalue(self):
+        self.flush_run()
+        return bytes(self.data)
+
+    def save(self, path):
+        with open(path, "wb") as file:
+            file.write(self.getvalue())
+
+
+class Replay:
+    def __init__(self, data):
+        if data[:4] != MAGIC:
+            raise ValueError("Not a snake replay file")
+        version, pos = read_varint(data, 4)
+        if version not in (1, VERSION):
+            raise ValueError(f"Unsupported replay version: {version}")
+        header = []
+        for _ in range(4 if version == 1 else 5):
+            value, pos = read_varint(data, pos)
+            header.append(value)
+        self.players, self.width, self.height, self.seed = header[:4]
+        self.game_speed = header[4] / 100 if version > 1 else None
+        self.data = data
+        self.start = pos
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as file:
+            return cls(file.read())
+
+    def commands(self):
+        # Yields ("step", actions) per engine step and ("reset", index)
+        data, pos = self.data, self.start
+        width = (self.players + 1) // 2
+        while pos < len(data):
+            value, pos = read_varint(data, pos)
+            if value & 1:
+                yield ("reset", value >> 1)
+                continue
+            actions = unpack_actions(data[pos:pos + width], self.players)
+            pos += width
+            for _ in range(value >> 1):
+                yield ("step", actions)
+
+
+class ReplayPlayer:
+    def __init__(self, replay):
+        self.replay = replay
+        self.engine = Engine(replay.players, replay.width, replay.height, replay.seed)
+        self.commands = replay.commands()
+        self.pending = None
+
+    def next_actions(self):
+        # Applies the resets before the next recorded step and returns that
+        # step's actions without running it, None at the end
+        if self.pending is None:
+            for command, arg in self.commands:
+                if command == "reset":
+                    self.engine.reset_snake(arg)
+                else:
+                    self.pending = arg
+                    break
+        return self.pending
+
+    def advance(self):
+        # Runs the next recorded step, returns its events or None at the end
+        actions = self.next_actions()
+        if actions is None:
+            return None
+        self.pending = None
+        return self.engine.step(actions)
+
+    def run(self):
+        while self.advance() is not None:
+            pass
+        return self.engine
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play back a recorded snake session")
+    parser.add_argument("path")
+    parser.add_argument("--headless", action="store_true", help="simulate at full speed without a window")
+    parser.add_argument("--speed", type=float, default=1.0, help="playback speed multiplier")
+    args = parser.parse_args(argv)
+
+    replay = Replay.load(args.path)
+    if args.headless:
+        start = time.perf_counter()
+        engine = ReplayPlayer(replay).run()
+        elapsed = time.perf_counter() - start
+        print(f"{engine.tick} ticks in {elapsed:.3f}s ({engine.tick / max(elapsed, 1e-9):.0f} ticks/s)")
+        print("Scores:", [snake.score for snake in engine.snakes])
+        return
+
+    import pygame
+    from assets import audio
+    from config import get_settings
+    from snake import ReplayGame
+    pygame.init()
+    audio.bind(get_settings())
+    screen = pygame.display.set_mode(get_settings()["window_size"], 0, 32)
+    pygame.display.set_caption("Greedy Snake - Replay")
+    ReplayGame(screen, replay, args.speed).run()
+    pygame.quit()
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,15 +1,24 @@
 import pygame
-import random
 import sys
 import os
 import time
-from main import load_config
+from config import get_settings
+from assets import render_text, get_font, audio
+from timing import TickScheduler
+from render import GameRenderer, static_layer
+from idle import wait_events, IdleMeter, REDRAW_EVENTS
+from replay import ReplayRecorder, ReplayPlayer
+from perf import profiler, TOGGLE_KEY
+from ai import Autopilot
+from engine import Engine, NOOP, MOVE_UP, MOVE_DOWN, MOVE_LEFT, MOVE_RIGHT, SPRINT
 
 BASE_PATH = os.path.dirname(os.path.abspath(__file__))
 
 FONT_PATH = os.path.join(BASE_PATH, "resources", "Daydream.ttf")
 CONFIG_PATH = os.path.join(BASE_PATH, "resources", "config.json")
 SOUND_PATH = os.path.join(BASE_PATH, "resources", "sounds", "fruit.wav")
+BACKGROUND_PATH = os.path.join(BASE_PATH, "resources", "background.jpg")
+REPLAYS_PATH = os.path.join(BASE_PATH, "replays")
 
 TEXT_COLOR = (255, 255, 255)
 
@@ -20,228 +29,47 @@ GRID_SIZE = 20
 GRID_WIDTH = SCREEN_WIDTH // GRID_SIZE
 GRID_HEIGHT = SCREEN_HEIGHT // GRID_SIZE
 
-UP = (0, -1)
-DOWN = (0, 1)
-LEFT = (-1, 0)
-RIGHT = (1, 0)
 
-
-
-class Snake():
-    def __init__(self):
-        self.length = 1
-        self.position = [((SCREEN_WIDTH/2), (SCREEN_HEIGHT/2))]
-        self.direction = random.choice([UP, DOWN, LEFT, RIGHT])
-        self.color = (random.randint(5, 200), random.randint(5, 200), random.randint(5, 200))
-        self.score = 0
-        self.speed_modifier = 1
-        self.effect_timer = 0
-        self.move_timer = 0
-        self.paused = False
-
-    def should_move(self, base_speed, game_speed):
-        self.move_timer += 1
-        frames_per_move = int(60 / (base_speed * self.speed_modifier * game_speed))
-
-        if self.move_timer >= frames_per_move:
-            self.move_timer = 0
-            return True
-        return False
-
-    def update_speed(self):
-        if self.effect_timer > 0:
-            self.effect_timer -= 1
-            if self.effect_timer == 0:
-                self. speed_modifier = 1
-
-    def get_head_position(self):
-        return self.position[0]
-
-    def turn(self, point):
-        if self.length > 1 and (point[0]*-1, point[1]*-1) == self.direction:
-            return
-        else:
-            self.direction = point
-
-    def move(self):
-        self.update_speed()
-        cur = self.get_head_position()
-        x, y = self.direction
-        new = (((cur[0]+(x*GRID_SIZE))%SCREEN_WIDTH),
-            (cur[1]+(y*GRID_SIZE))%SCREEN_HEIGHT)
-        if len(self.position) > 2 and new in self.position[2:]:
-            return False
-        else:
-            if self.paused:
-                return True
-            self.position.insert(0, new)
-            if len(self.position) > self.length:
-                self.position.pop()
-            return True
-
-    def reset(self):
-        self.length = 1
-        self.position = [((SCREEN_WIDTH/2), (SCREEN_HEIGHT/2))]
-        self.direction = random.choice([UP, DOWN, LEFT, RIGHT])
-        self.score = 0
-        self.speed_modifier = 1
-
-    def draw(self, surface):
-        for p in self.position:
-            r = pygame.Rect((p[0], p[1]), (GRID_SIZE, GRID_SIZE))
-            pygame.draw.rect(surface, self.color, r)
-            pygame.draw.rect(surface, (93, 216, 228), r, 1)
-
-    def handle_keys(self, keys, events, shift_sound=None):
-        for event in events:
-            if event.type == pygame.QUIT:
-                return False
-            elif event.type == pygame.KEYDOWN:
-                if event.key == keys["pause"]:
-                    self.paused = not self.paused
-                elif event.key == pygame.K_BACKSPACE:
-                    return False
-                elif event.key == keys["move_up"]:
-                    self.turn(UP)
-                elif event.key == keys["move_down"]:
-                    self.turn(DOWN)
-                elif event.key == keys["move_left"]:
-                    self.turn(LEFT)
-                elif event.key == keys["move_right"]:
-                    self.turn(RIGHT)
-                elif event.key == keys["sprint"]:
-                    shift_sound.play()
-                    if self.speed_modifier == 1:
-                        self.speed_modifier = 1.5
-                    elif self.speed_modifier == 1.5:
-                        self.speed_modifier = 1
-        return True  # Continue game
-
-
-class Consumable():
-    def __init__(self, color=(0, 0, 225), points=10):
-        self.position = (0, 0)
-        self.color = color
-        self.points = points
-        self.randomize_position()
-
-    def randomize_position(self):
-        self.position = (
-                        random.randint(0, GRID_WIDTH - 1) * GRID_SIZE, 
-                        random.randint(0, GRID_HEIGHT - 1) * GRID_SIZE)
-    
-    def draw(self, surface):
-        center = (self.position[0] + GRID_SIZE // 2, self.position[1] + GRID_SIZE // 2)
-        radius = GRID_SIZE // 2 - 2
-        pygame.draw.circle(surface, self.color, center, radius)
-        pygame.draw.circle(surface, (93, 216, 228), center, radius, 1)
-    
-    def effect(self, snake):
-        snake.score += self.points
-
-class Blueberry(Consumable):
-    def __init__(self):
-        super().__init__(color=(0, 0, 255), points=10)
-
-class Apple(Consumable):
-    def __init__(self):
-        super().__init__(color=(255, 0, 0), points=20)
-
-class Watermelon(Consumable):
-    def __init__(self):
-        super().__init__(color=(0, 255, 0), points=30)
-
-class SpeedBoost(Consumable):
-    def __init__(self):
-        super().__init__(color=(0, 150, 0), points=5)
-    
-    def apply_effect(self, snake):
-        snake.speed_modifier = 1.75
-        snake.effect_timer = 200
-    
-    def draw(self, surface):
-        r = pygame.Rect((self.position[0], self.position[1]), (GRID_SIZE, GRID_SIZE))
-        pygame.draw.rect(surface, self.color, r)
-        pygame.draw.rect(surface, (93, 216, 228), r, 1)
-
-class SpeedDebuff(Consumable):
-    def __init__(self):
-        super().__init__(color=(150, 0, 0))
-    
-    def apply_effect(self, snake):
-        snake.speed_modifier = 0.7
-        snake.effect_timer = 18    
-    def draw(self, surface):
-        r = pygame.Rect((self.position[0], self.position[1]), (GRID_SIZE, GRID_SIZE))
-        pygame.draw.rect(surface, self.color, r)
-        pygame.draw.rect(surface, (93, 216, 228), r, 1)
-
-def get_random_food():
-    food_classes = [Blueberry(), Apple(), Watermelon(), SpeedBoost(), SpeedDebuff()]
-    return random.choices(food_classes, weights = [8, 6, 4, 5, 4], k = 14)[0]
-
-
-def adjust_food_count(foods, score):
-    desired_count = 1
-
-    if 200 <= score < 1000:
-        desired_count = 3
-    elif score >= 1000:
-        desired_count = 5
-
-    while len(foods) < desired_count:
-        foods.append(get_random_food())
-    
-    while len(foods) > desired_count:
-        foods.pop()
-
-def draw_grid(surface):
-    surface.fill((0,0,0,0))
-    line_color = (255,255,255,10)
-
-    for x in range(0, SCREEN_WIDTH, GRID_SIZE):
-        pygame.draw.line(surface, line_color, (x, 0), (x, SCREEN_HEIGHT))
-
-    # Draw horizontal lines
-    for y in range(0, SCREEN_HEIGHT, GRID_SIZE):
-        pygame.draw.line(surface, line_color, (0, y), (SCREEN_WIDTH, y))
-
-def pause(screen, snake, keys, background, grid_surface, myfont):
-    while snake.paused:
-        screen.blit(background, (0,0))
-        screen.blit(grid_surface, (0,0))
-        pause_text = myfont.render("Game Paused", True, TEXT_COLOR)
-        resume_text = myfont.render("Press R to resume or BACKSPACE to EXIT", True, TEXT_COLOR)
+def pause(screen, static, myfont):
+    def draw():
+        screen.blit(static, (0,0))
+        pause_text = render_text(myfont, "Game Paused", TEXT_COLOR)
+        resume_text = render_text(myfont, "Press R to resume or BACKSPACE to EXIT", TEXT_COLOR)
         screen.blit(pause_text, (SCREEN_WIDTH // 2 - 160, SCREEN_HEIGHT // 2 - 60))
         screen.blit(resume_text, (SCREEN_WIDTH // 2 - 380, SCREEN_HEIGHT // 2 - 25))
-
         pygame.display.update()
 
-        for event in pygame.event.get():
+    meter = IdleMeter("Pause screen")
+    draw()
+    while True:
+        # Nothing moves while paused, sleep until a key press or an expose
+        for event in wait_events():
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_r:
-                    snake.paused = False
+                    meter.report()
                     return True
                 elif event.key == pygame.K_BACKSPACE:
+                    meter.report()
                     return False
+            elif event.type in REDRAW_EVENTS:
+                draw()
             
     
 
-def game_over_screen(screen, snake, background, grid_surface, myfont, score, multiplayer=False):
-    while True:
-        screen.blit(background, (0,0))
-        screen.blit(grid_surface, (0,0))
+def game_over_screen(screen, static, myfont, score, multiplayer=False):
+    def draw():
+        screen.blit(static, (0,0))
 
-        game_over_text = myfont.render("Game Over", True, TEXT_COLOR)
-        restart_text = myfont.render("Press R to restart or ESC to EXIT", True, TEXT_COLOR)
+        game_over_text = render_text(myfont, "Game Over", TEXT_COLOR)
+        restart_text = render_text(myfont, "Press R to restart or ESC to EXIT", TEXT_COLOR)
         if multiplayer:
-            score_text1 = myfont.render(f"Player1 Score: {score[0]}", True, TEXT_COLOR)
-            score_text2 = myfont.render(f"Player2 Score: {score[1]}", True, TEXT_COLOR)
+            score_text1 = render_text(myfont, f"Player1 Score: {score[0]}", TEXT_COLOR)
+            score_text2 = render_text(myfont, f"Player2 Score: {score[1]}", TEXT_COLOR)
         else:
-            score_text = myfont.render(f"Final Score: {score}", True, TEXT_COLOR)
+            score_text = render_text(myfont, f"Final Score: {score}", TEXT_COLOR)
 
         screen.blit(game_over_text, (SCREEN_WIDTH // 2 - 120, SCREEN_HEIGHT // 2 - 60))
         if not multiplayer:
@@ -254,197 +82,295 @@ def game_over_screen(screen, snake, background, grid_surface, myfont, score, mul
 
         pygame.display.update()
 
-        for event in pygame.event.get():
+    meter = IdleMeter("Game over screen")
+    draw()
+    while True:
+        for event in wait_events():
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_ESCAPE or event.key == pygame.K_BACKSPACE:
+                    meter.report()
                     return False
                 elif event.key == pygame.K_r:
-                    snake.reset()
+                    meter.report()
                     return True
+            elif event.type in REDRAW_EVENTS:
+                draw()
 
-class BaseSnakeGame:
-    def __init__(self, screen):
-        self.screen = screen
-        self.clock = pygame.time.Clock()
-        self.surface = pygame.Surface(screen.get_size()).convert()
-
-        self.background = pygame.image.load("resources/background.jpg")
-        self.background = pygame.transform.scale(self.background, (SCREEN_WIDTH, SCREEN_HEIGHT))
-
-        self.grid_surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-        draw_grid(self.grid_surface)
+def player_two_color(color):
+    return (abs(255 - color[0]), abs(155 - color[1]), abs(55 - color[2]))
 
-        self.surface.blit(self.background, (0, 0))
-        self.surface.blit(self.grid_surface, (0, 0))
 
-        self.font = pygame.font.Font(FONT_PATH, 20)
-        self.base_speed = 10
-        self.foods = [get_random_food()]
-
-        self.settings = load_config()
-
-        try:
-            pygame.mixer.music.load("resources/music.mp3")
-            pygame.mixer.music.set_volume(self.settings["music_volume"])
-            pygame.mixer.music.play(-1)
+class BaseSnakeGame:
+    players = 1
+    mode = "single"
+    records = True  # played sessions are saved when record_replays is on
 
-            self.death_sound = pygame.mixer.Sound("resources/sounds/death.wav")
-            self.shift_sound = pygame.mixer.Sound("resources/sounds/shift.wav")
-            self.eat_sound = pygame.mixer.Sound("resources/sounds/fruit.wav")
-            self.speed_buff_sound = pygame.mixer.Sound("resources/sounds/buff.wav")
-            self.speed_debuff_sound = pygame.mixer.Sound("resources/sounds/debuff.wav")
+    def __init__(self, screen, replay_path=None, seed=None):
+        # seed fixes food spawns, start directions and colours. None picks a fresh one.
+        self.seed = seed
+        self.screen = screen
+        self.clock = pygame.time.Clock()
+        self.static = static_layer(screen.get_size(), BACKGROUND_PATH, (SCREEN_WIDTH, SCREEN_HEIGHT), GRID_SIZE)
 
-            for snd in [self.death_sound, self.shift_sound, self.eat_sound, self.speed_buff_sound, self.speed_debuff_sound]:
-                snd.set_volume(self.settings["sound_effects_volume"])
-        except pygame.error as e:
-            print("Failed to load sound:", e)
+        self.settings = get_settings()
+        self.frame_rate = self.settings.get("frame_rate", 60)
+        self.key_bindings = [self.settings["key_bindings"][f"player{i+1}"] for i in range(self.players)]
 
+        self.font = get_font(FONT_PATH, 20)
+        self.base_speed = 10  # logic ticks per second at game speed 1
+        self.engine = self.create_engine()
+        self.autopilots = {}  # snake index -> Autopilot for CPU players
+        self.paused = False
 
-class SinglePlayerGame(BaseSnakeGame):
-    def __init__(self, screen):
-        super().__init__(screen)
-        self.snake = Snake()
+        if replay_path is None and self.records and self.settings.get("record_replays"):
+            os.makedirs(REPLAYS_PATH, exist_ok=True)
+            # Games started within the same second differ by seed, or with
+            # a fixed --seed by a counter
+            name = os.path.join(REPLAYS_PATH, f"{time.strftime('%Y%m%d-%H%M%S')}-{self.mode}-{self.engine.seed}")
+            replay_path = f"{name}.snkr"
+            count = 2
+            while os.path.exists(replay_path):
+                replay_path = f"{name}-{count}.snkr"
+                count += 1
+        self.replay_path = replay_path
+        self.recorder = ReplayRecorder(self.engine, self.settings["game_speed"]) if replay_path else None
+
+        self.renderer = GameRenderer(screen, self.static, GRID_SIZE, self.font, TEXT_COLOR)
+        self.renderer.attach(self.engine)
+        self.engine.profiler = profiler
+        profiler.set_enabled(self.settings.get("perf_hud", False))
+
+        audio.play_music()
+
+    def create_engine(self):
+        return Engine(self.players, GRID_WIDTH, GRID_HEIGHT, seed=self.seed)
+
+    def save_replay(self):
+        if self.recorder is not None:
+            self.recorder.save(self.replay_path)
+            print(f"Replay of seed {self.engine.seed} saved to {self.replay_path} ({self.recorder.ticks} ticks, {len(self.recorder.getvalue())} bytes)")
+
+    def toggle_perf_hud(self):
+        self.settings["perf_hud"] = not profiler.enabled
+        profiler.set_enabled(self.settings["perf_hud"])
+
+    def perf_overlay(self):
+        if not profiler.enabled:
+            return None
+        return (profiler.overlay(), profiler.overlay_pos(self.screen))
+
+    def handle_keys(self, events, actions):
+        # Folds key presses into the pending per-player actions, returns False to leave the game
+        for event in events:
+            if event.type == pygame.QUIT:
+                return False
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_BACKSPACE:
+                    return False
+                elif event.key == TOGGLE_KEY:
+                    self.toggle_perf_hud()
+                for i, keys in enumerate(self.key_bindings):
+                    if event.key == keys["pause"]:
+                        self.paused = not self.paused
+                    elif event.key == keys["move_up"]:
+                        actions[i] = (actions[i] & SPRINT) | MOVE_UP
+                    elif event.key == keys["move_down"]:
+                        actions[i] = (actions[i] & SPRINT) | MOVE_DOWN
+                    elif event.key == keys["move_left"]:
+                        actions[i] = (actions[i] & SPRINT) | MOVE_LEFT
+                    elif event.key == keys["move_right"]:
+                        actions[i] = (actions[i] & SPRINT) | MOVE_RIGHT
+                    elif event.key == keys["sprint"]:
+                        audio.play("shift")
+                        actions[i] ^= SPRINT
+        return True  # Continue game
 
     def run(self):
-        print("Single Player Game start")
+        print(self.start_message)
+        try:
+            self.game_loop()
+        finally:
+            self.save_replay()  # also when the window is closed from pause or game over
+
+    def game_loop(self):
+        pending = [NOOP] * self.players
+        scheduler = TickScheduler(self.players)
+        self.clock.tick()
+        profiler.reset()
+        last_tick = self.engine.tick
         while True:
-            self.clock.tick(self.base_speed * self.snake.speed_modifier * self.settings["game_speed"])
+            profiler.frame(self.engine.tick - last_tick)
+            last_tick = self.engine.tick
+            # Render at the display rate, the scheduler decides how many logic ticks each snake is due
+            dt = self.clock.tick(self.frame_rate) / 1000
+            profiler.mark("wait")
             events = pygame.event.get()
 
-            if not self.snake.handle_keys(self.settings["key_bindings"]["player1"], events, shift_sound=self.shift_sound):
+            if not self.handle_keys(events, pending):
                 break
+            profiler.mark("events")
 
-            adjust_food_count(self.foods, self.snake.score)
-
-            self.surface.blit(self.background, (0, 0))
-            self.surface.blit(self.grid_surface, (0, 0))
-
-            if self.snake.paused:
-                ret = pause(self.screen, self.snake, self.settings["key_bindings"]["player1"], self.background, self.grid_surface, self.font)
+            if self.paused:
+                self.paused = False
+                ret = pause(self.screen, self.static, self.font)
                 if not ret:
                     break
+                scheduler.reset()
+                self.renderer.invalidate()
+                self.clock.tick()
+                profiler.reset()
+                continue
 
-            alive = self.snake.move()
-            if not alive:
-                self.death_sound.play()
-                ret = game_over_screen(self.screen, self.snake, self.background, self.grid_surface, self.font, self.snake.score)
-                if not ret:
+            game_speed = self.settings["game_speed"]
+            due = scheduler.advance(dt, [self.base_speed * s.speed_modifier * game_speed for s in self.engine.snakes])
+            while any(due):
+                actions = [None] * self.players
+                for i in range(self.players):
+                    if due[i]:
+                        due[i] -= 1
+                        if i in self.autopilots:
+                            actions[i] = self.autopilots[i].action()
+                        else:
+                            actions[i] = pending[i]
+                        pending[i] = NOOP
+
+                game_events = self.engine.step(actions)
+                self.play_sounds(game_events)
+
+                deaths = [e[1] for e in game_events if e[0] == "death"]
+                if deaths:
+                    if not self.game_over():
+                        return
+                    for i in deaths:
+                        self.engine.reset_snake(i)
+                    scheduler.reset()
+                    self.renderer.invalidate()
+                    self.clock.tick()
+                    profiler.reset()
                     break
+            profiler.mark("sim")
+
+            rects = self.renderer.render(self.hud_lines(), self.perf_overlay())
+            profiler.mark("draw")
+            self.renderer.present(rects)
+            profiler.mark("present")
+
+    def play_sounds(self, events):
+        for event in events:
+            if event[0] == "death":
+                audio.play("death")
+            else:
+                audio.play(event[2].kind)  # "fruit", "buff" or "debuff"
+
+
+class SinglePlayerGame(BaseSnakeGame):
+    start_message = "Single Player Game start"
+
+    def hud_lines(self):
+        return [(f"Score {self.engine.snakes[0].score}", (5, 10))]
 
-            head_pos = self.snake.get_head_position()
-            for food in self.foods[:]:
-                if head_pos == food.position:
-                    self.snake.length += 1
-                    self.snake.score += food.points
-                    if isinstance(food, SpeedBoost):
-                        self.speed_buff_sound.play()
-                        food.apply_effect(self.snake)
-                    elif isinstance(food, SpeedDebuff):
-                        self.speed_debuff_sound.play()
-                        food.apply_effect(self.snake)
-                    else:
-                        self.eat_sound.play()
-                    self.foods.remove(food)
-                    self.foods.append(get_random_food())
-                food.draw(self.surface)
-
-            self.snake.draw(self.surface)
-            self.screen.blit(self.surface, (0, 0))
-            self.surface.blit(self.grid_surface, (0, 0))
-
-            score_text = self.font.render(f"Score {self.snake.score}", True, TEXT_COLOR)
-            self.screen.blit(score_text, (5, 10))
-            pygame.display.update()
+    def game_over(self):
+        return game_over_screen(self.screen, self.static, self.font, self.engine.snakes[0].score)
 
 
 class MultiPlayerGame(BaseSnakeGame):
-    def __init__(self, screen):
+    start_message = "Multiplayer Game start"
+    players = 2
+    mode = "multi"
+
+    def __init__(self, screen, replay_path=None, seed=None, cpu_player=None):
+        super().__init__(screen, replay_path, seed)
+        snakes = self.engine.snakes
+        snakes[1].color = player_two_color(snakes[1].color)  # Different color for player 2
+        if cpu_player is None:
+            cpu_player = self.settings.get("cpu_player", False)
+        if cpu_player:
+            self.autopilots[1] = Autopilot(self.engine, 1)
+
+    def hud_lines(self):
+        return [(f"{'CPU' if i in self.autopilots else f'P{i+1}'} Score: {snake.score}", (5, 10 + i * 30))
+                for i, snake in enumerate(self.engine.snakes)]
+
+    def game_over(self):
+        snakes = self.engine.snakes
+        # Show game over screen with both scores
+        return game_over_screen(self.screen, 
+                                self.static, 
+                                self.font, 
+                                (snakes[0].score, snakes[1].score),
+                                True)
+
+
+class ReplayGame(BaseSnakeGame):
+    # Renders a recorded session, speed scales the recorded tick rate
+    records = False
+
+    def __init__(self, screen, replay, speed=1.0):
+        self.players = replay.players
+        self.player = ReplayPlayer(replay)
+        self.speed = speed
         super().__init__(screen)
-        self.snakes = [Snake(), Snake()]
-        self.snakes[1].color = (abs(255 - self.snakes[1].color[0]), 
-                                abs(155 - self.snakes[1].color[1]), 
-                                abs(55 - self.snakes[1].color[2]))  # Different color for player 2
+        if self.players == 2:
+            snakes = self.engine.snakes
+            snakes[1].color = player_two_color(snakes[1].color)
 
-    def run(self):
-        print("Multiplayer Game start")
-        while True:
-            game_speed = self.settings["game_speed"]
- 
-            self.clock.tick(60)
-            events = pygame.event.get()
+    def create_engine(self):
+        return self.player.engine
 
-            keys_p1 = self.settings["key_bindings"]["player1"]
-            keys_p2 = self.settings["key_bindings"]["player2"]
+    def hud_lines(self):
+        lines = [(f"P{i+1} Score: {snake.score}", (5, 10 + i * 30)) for i, snake in enumerate(self.engine.snakes)]
+        lines.append((f"Replay x{self.speed:g}", (5, 10 + len(lines) * 30)))
+        return lines
 
-            if not self.snakes[0].handle_keys(keys_p1, events, shift_sound=self.shift_sound):
-                break 
-            if not self.snakes[1].handle_keys(keys_p2, events, shift_sound=self.shift_sound):
-                break
+    def run(self):
+        print("Replay start")
+        # Every snake gets ticks at its recorded rate like in game_loop, a
+        # recorded step runs once all the snakes moving in it have one
+        game_speed = self.player.replay.game_speed or self.settings["game_speed"]
+        scheduler = TickScheduler(self.players)
+        budget = [0] * self.players
+        self.clock.tick()
+        profiler.reset()
+        last_tick = self.engine.tick
+        while True:
+            profiler.frame(self.engine.tick - last_tick)
+            last_tick = self.engine.tick
+            dt = self.clock.tick(self.frame_rate) / 1000
+            profiler.mark("wait")
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    return
+                elif event.type == pygame.KEYDOWN and event.key in (pygame.K_BACKSPACE, pygame.K_ESCAPE):
+                    return
+                elif event.type == pygame.KEYDOWN and event.key == TOGGLE_KEY:
+                    self.toggle_perf_hud()
+            profiler.mark("events")
+
+            due = scheduler.advance(dt, [self.base_speed * s.speed_modifier * game_speed * self.speed
+                                         for s in self.engine.snakes])
+            budget = [b + d for b, d in zip(budget, due)]
+            while True:
+                actions = self.player.next_actions()
+                if actions is None:
+                    self.renderer.draw(self.hud_lines())
+                    print(f"Replay finished after {self.engine.tick} ticks")
+                    return
+                moving = [i for i, action in enumerate(actions) if action is not None]
+                if any(budget[i] < 1 for i in moving):
+                    break
+                for i in moving:
+                    budget[i] -= 1
+                game_events = self.player.advance()
+                self.play_sounds(game_events)
+                if any(e[0] == "death" for e in game_events):
+                    scheduler.reset()  # the game over screen held the clock
+                    budget = [0] * self.players
+                    break
+            budget = [min(b, 1) for b in budget]  # the game never carried more than a tick over
+            profiler.mark("sim")
 
-            self.surface.blit(self.background, (0, 0))
-            self.surface.blit(self.grid_surface, (0, 0))
-
-            for i, snake in enumerate(self.snakes):
-                if snake.should_move(self.base_speed, game_speed):
-                    alive = snake.move()
-
-                    # Self-collision is already handled in move(), but we check for collision with the *other* snake here
-                    other_snake = self.snakes[1 - i]
-                    if snake.get_head_position() in other_snake.position:
-                        alive = False
-
-                    if snake.paused:
-                        ret = pause(self.screen, snake, self.settings["key_bindings"]["player1"], self.background, self.grid_surface, self.font)
-                        if not ret:
-                            return
-
-                    if not alive:
-                        self.death_sound.play()
-
-                        # Show game over screen with both scores
-                        score_text = f"P1 Score: {self.snakes[0].score}  |  P2 Score: {self.snakes[1].score}"
-                        ret = game_over_screen(self.screen, 
-                                               snake, 
-                                               self.background, 
-                                               self.grid_surface, 
-                                               self.font, 
-                                               (self.snakes[0].score, self.snakes[1].score),
-                                               True)
-
-                        if not ret:
-                            return
-
-
-            # Handle food consumption
-            for snake in self.snakes:
-                head_pos = snake.get_head_position()
-                for food in self.foods[:]:
-                    if head_pos == food.position:
-                        snake.length += 1
-                        snake.score += food.points
-                        if isinstance(food, SpeedBoost):
-                            self.speed_buff_sound.play()
-                            food.apply_effect(snake)
-                        elif isinstance(food, SpeedDebuff):
-                            self.speed_debuff_sound.play()
-                            food.apply_effect(snake)
-                        else:
-                            self.eat_sound.play()
-                        self.foods.remove(food)
-                        self.foods.append(get_random_food())
-                        break  # Prevent double-eating
-            adjust_food_count(self.foods, max(s.score for s in self.snakes))
-
-            for food in self.foods:
-                food.draw(self.surface)
-
-            for i, snake in enumerate(self.snakes):
-                snake.draw(self.surface)
-                score_text = self.font.render(f"P{i+1} Score: {snake.score}", True, TEXT_COLOR)
-                self.screen.blit(score_text, (5, 10 + i * 30))
-
-            self.screen.blit(self.surface, (0, 0))
-            pygame.display.update()
+            self.renderer.draw(self.hud_lines(), self.perf_overlay())
+            profiler.mark("draw")
@@ -0,0 +1,129 @@
+import os
+import multiprocessing
+from array import array
+from multiprocessing import shared_memory
+from vecenv import VectorEnv, buffer_layout, buffer_views, np
+
+# VectorEnv games sharded over worker processes.
+#
+# The whole batch lives in one shared memory block laid out like a single
+# VectorEnv of num_envs games, followed by one int32 action per game.
+# Each worker steps its own slice of the games in place, so the parent
+# reads rewards, done flags and the occupancy and food planes of all games
+# straight from the block without copying. Only a few bytes of command go
+# over each pipe per step.
+#
+#   with SubprocVectorEnv(4096, width=16, height=16, seed=0) as envs:
+#       rewards, terminated, truncated = envs.step(actions)
+
+
+def worker(conn, name, num_envs, width, height, first, count, seed, options):
+    memory = shared_memory.SharedMemory(name=name)
+    size = buffer_layout(num_envs, width, height)[1]
+    env = VectorEnv(count, width, height, seed, buffer=memory.buf, shard=(first, num_envs), **options)
+    actions = memory.buf[size + 4 * first:size + 4 * (first + count)].cast("i")
+    conn.send_bytes(b"ready")
+    try:
+        while True:
+            command = conn.recv_bytes()
+            if command == b"step":
+                env.step(actions)
+            elif command.startswith(b"reset"):
+                seed = command[6:].decode() or None
+                env.reset(seed)
+            elif command == b"close":
+                break
+            conn.send_bytes(b"ok")
+    except (EOFError, KeyboardInterrupt):
+        pass  # parent went away
+    finally:
+        actions.release()
+        env.close()
+        memory.close()
+
+
+class SubprocVectorEnv:
+    def __init__(self, num_envs, num_workers=None, width=64, height=36, seed=None, **options):
+        # options: passed on to every worker's VectorEnv (max_steps, backend, ...)
+        self.num_envs = num_envs
+        self.width = width
+        self.height = height
+        num_workers = min(num_workers or os.cpu_count() or 1, num_envs)
+
+        size = buffer_layout(num_envs, width, height)[1]
+        self.memory = shared_memory.SharedMemory(create=True, size=size + 4 * num_envs)
+        self.views = []
+        for name, (view, _) in buffer_views(self.memory.buf, num_envs, width, height).items():
+            setattr(self, name, view)
+            self.views.append(view)
+        self.actions = self.memory.buf[size:size + 4 * num_envs].cast("i")
+        self.views.append(self.actions)
+        self.action_array = np.frombuffer(self.actions, "int32") if np is not None else None
+
+        context = multiprocessing.get_context()
+        self.connections = []
+        self.processes = []
+        first = 0
+        for index in range(num_workers):
+            count = num_envs // num_workers + (index < num_envs % num_workers)
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(target=worker, daemon=True, name=f"snake-env-{index}",
+                                      args=(child_conn, self.memory.name, num_envs, width, height,
+                                            first, count, seed, options))
+            process.start()
+            child_conn.close()
+            self.connections.append(parent_conn)
+            self.processes.append(process)
+            first += count
+        self.wait()  # every worker has reset its games
+
+    def wait(self):
+        for conn in self.connections:
+            conn.recv_bytes()
+
+    def reset(self, seed=None):
+        for conn in self.connections:
+            conn.send_bytes(b"reset " + ("" if seed is None else str(seed)).encode())
+        self.wait()
+
+    def step_async(self, actions):
+        if self.action_array is not None:
+            self.action_array[:] = actions
+        else:
+            self.actions[:] = array("i", actions)
+        for conn in self.connections:
+            conn.send_bytes(b"step")
+
+    def step_wait(self):
+        self.wait()
+        return self.rewards, self.terminated, self.truncated
+
+    def step(self, actions):
+        self.step_async(actions)
+        return self.step_wait()
+
+    def close(self):
+        if self.memory is None:
+            return
+        for conn in self.connections:
+            try:
+                conn.send_bytes(b"close")
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self.processes:
+            process.join(5)
+            if process.is_alive():
+                process.terminate()
+        self.action_array = None
+        for view in self.views:
+            view.release()
+        self.views = []
+        self.memory.close()
+        self.memory.unlink()
+        self.memory = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
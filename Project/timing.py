@@ -0,0 +1,27 @@
+# Fixed-timestep scheduling, independent of the render frame rate.
+# Each snake has its own accumulator of fractional ticks, so speed
+# modifiers like 1.5 or 0.7 are honoured exactly over time instead of
+# being rounded to a whole number of frames per move.
+
+MAX_FRAME_TIME = 0.25  # seconds, longer frames are clamped to avoid a catch-up spiral
+
+
+class TickScheduler:
+    def __init__(self, count=1):
+        self.accumulators = [0.0] * count
+
+    def reset(self):
+        for i in range(len(self.accumulators)):
+            self.accumulators[i] = 0.0
+
+    def advance(self, dt, rates):
+        # dt in seconds, rates in ticks per second for each snake.
+        # Returns how many ticks each snake is due this frame.
+        dt = min(dt, MAX_FRAME_TIME)
+        due = []
+        for i, rate in enumerate(rates):
+            acc = self.accumulators[i] + dt * rate
+            ticks = int(acc)
+            self.accumulators[i] = acc - ticks
+            due.append(ticks)
+        return due
@@ -0,0 +1,103 @@
+import os
+import json
+import time
+import threading
+from array import array
+
+# Trace Event export of frame phases, for chrome://tracing or Perfetto.
+#
+# The profiler hands every finished phase to Tracer.record, which stores
+# three numbers in preallocated ring arrays. A background thread turns
+# them into JSON and appends them to the file, so the game loop never
+# formats or writes anything. If the writer falls a whole ring behind, the
+# oldest spans are dropped and counted instead of stalling the game.
+
+RING_SIZE = 1 << 16  # spans
+FLUSH_INTERVAL = 1.0  # seconds between writer wake-ups
+
+
+class Tracer:
+    def __init__(self, path, names, complete=(), ring_size=RING_SIZE):
+        # names: span names recorded. complete: the ones written as single
+        # "X" events, for spans that enclose others and may start at the
+        # same timestamp as their first child.
+        self.path = path
+        self.names = list(names)
+        self.complete = set(complete)
+        self.ids = {name: i for i, name in enumerate(self.names)}
+        self.kinds = array("B", bytes(ring_size))
+        self.starts = array("d", bytes(8 * ring_size))
+        self.ends = array("d", bytes(8 * ring_size))
+        self.ring_size = ring_size
+        self.count = 0  # spans recorded so far
+        self.written = 0  # spans handed to the file so far
+        self.dropped = 0
+        self.origin = time.perf_counter()
+
+        self.file = open(path, "w")
+        # JSON array format, the closing bracket is optional so a trace
+        # cut short by a crash still loads
+        self.file.write("[\n")
+        self.file.write(json.dumps({"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": 1,
+                                    "args": {"name": "game loop"}}))
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._writer, name="trace-writer", daemon=True)
+        self._thread.start()
+
+    def record(self, name, start, end):
+        i = self.count % self.ring_size
+        self.kinds[i] = self.ids[name]
+        self.starts[i] = start
+        self.ends[i] = end
+        self.count += 1
+        if self.count - self.written == self.ring_size // 2:
+            # Half a ring waiting, do not leave it to the timer
+            with self._cond:
+                self._cond.notify()
+
+    def _writer(self):
+        while True:
+            with self._cond:
+                if not self._closed:
+                    self._cond.wait(FLUSH_INTERVAL)
+                closed = self._closed
+            self._write_pending()
+            if closed:
+                return
+
+    def _write_pending(self):
+        end = self.count
+        start = self.written
+        if end - start > self.ring_size:
+            self.dropped += end - start - self.ring_size
+            start = end - self.ring_size
+        if start == end:
+            return
+
+        pid = os.getpid()
+        origin = self.origin
+        lines = []
+        for n in range(start, end):
+            i = n % self.ring_size
+            name = self.names[self.kinds[i]]
+            begin = (self.starts[i] - origin) * 1e6
+            finish = (self.ends[i] - origin) * 1e6
+            if name in self.complete:
+                lines.append(f',\n{{"name":"{name}","ph":"X","ts":{begin:.3f},"dur":{finish - begin:.3f},"pid":{pid},"tid":1}}')
+            else:
+                lines.append(f',\n{{"name":"{name}","ph":"B","ts":{begin:.3f},"pid":{pid},"tid":1}}')
+                lines.append(f',\n{{"name":"{name}","ph":"E","ts":{finish:.3f},"pid":{pid},"tid":1}}')
+        self.file.write("".join(lines))
+        self.file.flush()
+        self.written = end
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        self.file.write("\n]\n")
+        self.file.close()
+        print(f"Trace of {self.count} spans written to {self.path}"
+              + (f" ({self.dropped} dropped)" if self.dropped else ""))
@@ -0,0 +1,406 @@
+import random
+from array import array
+from engine import Grid, UP, DOWN, LEFT, RIGHT, MOVE_UP, MOVE_RIGHT, SPRINT, FOOD_TYPES, FOOD_WEIGHTS, desired_food_count
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Many independent single player games stepped in lockstep, for bots and
+# balance testing. The rules are the engine's (wraparound moves, a move
+# into any body cell including the tail is fatal, the same food table and
+# food counts), one step is one move of every snake.
+#
+# All state lives in one contiguous buffer, carved into typed memoryviews:
+#   body        num_envs rows of grid-size ring buffers, like Snake.body
+#   cells       snake occupancy plane per game (0/1)
+#   food        food plane per game, food type index + 1, 0 for none
+#   food_cells  up to MAX_FOODS food cells per game, food_count of them used
+#   free, free_index, free_count  per game set of cells with no snake and
+#               no food, a swap-remove array plus positions like Grid.free
+#   head, size, length, direction, score, steps per game
+#   rewards, terminated, truncated of the last step
+#   final_score, final_steps of the episode that ended in the last step
+# Games that end are reset straight away, so after step() the state is
+# already the first state of the next episode where terminated/truncated
+# is set. The buffer can be supplied by the caller, e.g. shared memory,
+# and may hold more games than this env steps: with shard=(first, total)
+# the buffer is laid out for total games and this env owns num_envs of
+# them starting at first (see subproc.SubprocVectorEnv).
+#
+# With numpy available the moves of all games are done as array
+# operations over the same buffer. The rarer work (eating, spawning,
+# resets) runs per game in both backends. Every game draws from its own
+# random stream, seeded from the seed and the game's index in the whole
+# batch, so for a given seed both backends and any sharding produce the
+# same games.
+
+DIRECTIONS = [UP, DOWN, LEFT, RIGHT]  # indexed by action - MOVE_UP
+OPPOSITE = [1, 0, 3, 2]
+FOOD_POINTS = [food_class(0).points for food_class in FOOD_TYPES]
+FOOD_CUM_WEIGHTS = [sum(FOOD_WEIGHTS[:i + 1]) for i in range(len(FOOD_WEIGHTS))]
+MAX_FOODS = max(desired_food_count(score) for score in (0, 200, 1000))
+
+DEATH_REWARD = -10.0
+
+ITEM_SIZES = {"i": 4, "f": 4, "B": 1}
+NUMPY_TYPES = {"i": "int32", "f": "float32", "B": "uint8"}
+
+
+def buffer_layout(num_envs, width, height):
+    # [(name, typecode, count, offset)] and the total size in bytes. The
+    # 4 byte fields come first so every field is aligned.
+    size = width * height
+    fields = [
+        ("body", "i", num_envs * size),
+        ("head", "i", num_envs),
+        ("size", "i", num_envs),
+        ("length", "i", num_envs),
+        ("direction", "i", num_envs),
+        ("score", "i", num_envs),
+        ("steps", "i", num_envs),
+        ("food_cells", "i", num_envs * MAX_FOODS),
+        ("food_count", "i", num_envs),
+        ("free", "i", num_envs * size),
+        ("free_index", "i", num_envs * size),
+        ("free_count", "i", num_envs),
+        ("final_score", "i", num_envs),
+        ("final_steps", "i", num_envs),
+        ("rewards", "f", num_envs),
+        ("cells", "B", num_envs * size),
+        ("food", "B", num_envs * size),
+        ("terminated", "B", num_envs),
+        ("truncated", "B", num_envs),
+    ]
+    layout = []
+    offset = 0
+    for name, code, count in fields:
+        layout.append((name, code, count, offset))
+        offset += count * ITEM_SIZES[code]
+    return layout, offset
+
+def buffer_views(buffer, num_envs, width, height, first=0, count=None):
+    # {name: (typed memoryview, byte offset)} of games first..first+count
+    # in a buffer laid out for num_envs games
+    if count is None:
+        count = num_envs
+    layout, total = buffer_layout(num_envs, width, height)
+    buffer = memoryview(buffer).cast("B")
+    if len(buffer) < total:
+        raise ValueError(f"Buffer too small: {len(buffer)} bytes, {total} needed")
+    views = {}
+    for name, code, size, offset in layout:
+        per_env = size // num_envs
+        offset += first * per_env * ITEM_SIZES[code]
+        end = offset + count * per_env * ITEM_SIZES[code]
+        views[name] = (buffer[offset:end].cast(code), offset)
+    return views
+
+
+class VectorEnv:
+    def __init__(self, num_envs, width=64, height=36, seed=None, max_steps=None,
+                 death_reward=DEATH_REWARD, backend="auto", buffer=None, shard=None):
+        if backend == "auto":
+            backend = "numpy" if np is not None else "python"
+        if backend == "numpy" and np is None:
+            raise ImportError("The numpy backend needs numpy installed")
+        if backend not in ("numpy", "python"):
+            raise ValueError(f"Unknown backend: {backend}")
+        self.backend = backend
+        self.num_envs = num_envs
+        self.width = width
+        self.height = height
+        self.grid_size = width * height
+        self.max_steps = max_steps
+        self.death_reward = death_reward
+        self.center = (height // 2) * width + width // 2
+        self.all_cells = array("i", range(self.grid_size))
+
+        first, total_envs = shard or (0, num_envs)
+        self.first = first
+        if buffer is None:
+            buffer = bytearray(buffer_layout(total_envs, width, height)[1])
+        self.buffer = memoryview(buffer).cast("B")
+        self.fields = []
+        self.arrays = {}
+        for name, (view, offset) in buffer_views(self.buffer, total_envs, width, height, first, num_envs).items():
+            setattr(self, name, view)
+            self.fields.append(name)
+            if backend == "numpy":
+                self.arrays[name] = np.frombuffer(self.buffer, NUMPY_TYPES[view.format], len(view), offset)
+
+        # Wrapped neighbour of every cell, one grid-size block per direction
+        grid = Grid(width, height)
+        self.neighbors = array("i")
+        for direction in DIRECTIONS:
+            self.neighbors.extend(grid.neighbors[direction])
+
+        if backend == "numpy":
+            a = self.arrays
+            rows = (num_envs, self.grid_size)
+            self.body2d = a["body"].reshape(rows)
+            self.cells2d = a["cells"].reshape(rows)
+            self.food2d = a["food"].reshape(rows)
+            self.food_cells2d = a["food_cells"].reshape((num_envs, MAX_FOODS))
+            self.neighbors2d = np.array(self.neighbors, dtype=np.int32).reshape((len(DIRECTIONS), self.grid_size))
+            self.opposite = np.array(OPPOSITE, dtype=np.int32)
+            self.env_index = np.arange(num_envs)
+
+        self.reset(seed)
+
+    def close(self):
+        # Lets go of every view of the buffer, shared memory cannot be
+        # closed while any is alive
+        self.arrays = {}
+        self.body2d = self.cells2d = self.food2d = self.food_cells2d = None
+        for name in self.fields:
+            getattr(self, name).release()
+        self.buffer.release()
+
+    def reset(self, seed=None):
+        self.randoms = [random.Random(None if seed is None else f"{seed}/{self.first + i}")
+                        for i in range(self.num_envs)]
+        for i in range(self.num_envs):
+            self.reset_env(i)
+        for name in ("rewards", "terminated", "truncated", "final_score", "final_steps"):
+            view = getattr(self, name)
+            for i in range(self.num_envs):
+                view[i] = 0
+
+    def reset_env(self, i):
+        size = self.grid_size
+        base = i * size
+        self.cells[base:base + size] = bytes(size)
+        self.food[base:base + size] = bytes(size)
+        self.free[base:base + size] = self.all_cells
+        self.free_index[base:base + size] = self.all_cells
+        self.free_count[i] = size
+        self.body[base] = self.center
+        self.cells[base + self.center] = 1
+        self.take(i, self.center)
+        self.head[i] = 0
+        self.size[i] = 1
+        self.length[i] = 1
+        self.direction[i] = self.randoms[i].randrange(len(DIRECTIONS))
+        self.score[i] = 0
+        self.steps[i] = 0
+        self.food_count[i] = 0
+        self.spawn_food(i)
+
+    def finish_env(self, i):
+        self.final_score[i] = self.score[i]
+        self.final_steps[i] = self.steps[i]
+        self.reset_env(i)
+
+    def take(self, i, cell):
+        base = i * self.grid_size
+        free, free_index = self.free, self.free_index
+        index = free_index[base + cell]
+        count = self.free_count[i] - 1
+        self.free_count[i] = count
+        last = free[base + count]
+        free[base + index] = last
+        free_index[base + last] = index
+        free_index[base + cell] = -1
+
+    def release(self, i, cell):
+        base = i * self.grid_size
+        count = self.free_count[i]
+        self.free[base + count] = cell
+        self.free_index[base + cell] = count
+        self.free_count[i] = count + 1
+
+    def free_cell(self, i):
+        # Random cell with no snake and no food, None when there is none
+        count = self.free_count[i]
+        if not count:
+            return None
+        return self.free[i * self.grid_size + self.randoms[i].randrange(count)]
+
+    def spawn_food(self, i):
+        # Tops the food up to the count the engine keeps for this score
+        while self.food_count[i] < desired_food_count(self.score[i]):
+            cell = self.free_cell(i)
+            if cell is None:
+                return
+            kind = self.randoms[i].choices(range(len(FOOD_TYPES)), cum_weights=FOOD_CUM_WEIGHTS)[0]
+            self.food[i * self.grid_size + cell] = kind + 1
+            self.take(i, cell)
+            self.food_cells[i * MAX_FOODS + self.food_count[i]] = cell
+            self.food_count[i] += 1
+
+    def eat(self, i, cell):
+        # The head of game i just moved onto a food, returns its points
+        base = i * self.grid_size
+        points = FOOD_POINTS[self.food[base + cell] - 1]
+        self.food[base + cell] = 0
+        slots = i * MAX_FOODS
+        last = slots + self.food_count[i] - 1
+        for slot in range(slots, last + 1):
+            if self.food_cells[slot] == cell:
+                self.food_cells[slot] = self.food_cells[last]
+                break
+        self.food_count[i] -= 1
+        self.length[i] += 1
+        self.score[i] += points
+        self.spawn_food(i)
+        return points
+
+    def step(self, actions):
+        # actions: one engine action (NOOP, MOVE_*) per game, SPRINT is
+        # ignored as every game moves exactly once. Returns the rewards,
+        # terminated and truncated buffers.
+        if self.backend == "numpy":
+            self.step_numpy(actions)
+        else:
+            self.step_python(actions)
+        return self.rewards, self.terminated, self.truncated
+
+    def step_python(self, actions):
+        size = self.grid_size
+        neighbors = self.neighbors
+        body, cells, food = self.body, self.cells, self.food
+        free, free_index = self.free, self.free_index
+        head, length, direction, steps = self.head, self.length, self.direction, self.steps
+        rewards, terminated, truncated = self.rewards, self.terminated, self.truncated
+        max_steps = self.max_steps
+        done = []
+        for i in range(self.num_envs):
+            d = direction[i]
+            action = actions[i] & ~SPRINT
+            if MOVE_UP <= action <= MOVE_RIGHT:
+                turn = action - MOVE_UP
+                if length[i] == 1 or turn != OPPOSITE[d]:
+                    d = direction[i] = turn
+
+            base = i * size
+            h = head[i]
+            new = neighbors[d * size + body[base + h]]
+            steps[i] += 1
+            if cells[base + new]:
+                rewards[i] = self.death_reward
+                terminated[i] = 1
+                truncated[i] = 0
+                done.append(i)
+                continue
+
+            h = head[i] = (h - 1) % size
+            body[base + h] = new
+            cells[base + new] = 1
+            n = self.size[i]
+            grows = n < length[i]
+            if grows:
+                self.size[i] = n + 1
+            else:
+                tail = body[base + (h + n) % size]
+                cells[base + tail] = 0
+            # Food never lies under a snake, so the tail cell is free again
+            if food[base + new]:
+                if not grows:
+                    self.release(i, tail)
+            elif grows:
+                self.take(i, new)
+            else:
+                # Just moving: the tail takes the head cell's place in the free set
+                index = free_index[base + new]
+                free[base + index] = tail
+                free_index[base + tail] = index
+                free_index[base + new] = -1
+
+            rewards[i] = self.eat(i, new) if food[base + new] else 0.0
+            terminated[i] = 0
+            truncated[i] = max_steps is not None and steps[i] >= max_steps
+            if truncated[i]:
+                done.append(i)
+
+        for i in done:
+            self.finish_env(i)
+
+    def step_numpy(self, actions):
+        a = self.arrays
+        size = self.grid_size
+        head, sizes, length, direction, steps = a["head"], a["size"], a["length"], a["direction"], a["steps"]
+        body, cells, food = self.body2d, self.cells2d, self.food2d
+
+        action = np.asarray(actions, dtype=np.int32) & ~SPRINT
+        turn = action - MOVE_UP
+        valid = (action >= MOVE_UP) & (action <= MOVE_RIGHT)
+        valid &= (length == 1) | (turn != self.opposite[direction])
+        direction[valid] = turn[valid]
+
+        index = self.env_index
+        new = self.neighbors2d[direction, body[index, head]]
+        steps += 1
+        dead = cells[index, new] != 0
+        alive = index[~dead]
+        new_alive = new[alive]
+
+        new_head = (head[alive] - 1) % size
+        head[alive] = new_head
+        body[alive, new_head] = new_alive
+        cells[alive, new_alive] = 1
+        grows = sizes[alive] < length[alive]
+        tails = body[alive, (new_head + sizes[alive]) % size]  # only used where the snake does not grow
+        sizes[alive[grows]] += 1
+        moving = ~grows
+        cells[alive[moving], tails[moving]] = 0
+
+        # Free sets, the same updates as step_python. Flat indices are
+        # much cheaper than 2d fancy indexing here.
+        eats = food[alive, new_alive] != 0
+        swap = moving & ~eats
+        base = alive[swap] * size
+        heads = base + new_alive[swap]
+        free, free_index = a["free"], a["free_index"]
+        index = free_index[heads]
+        tails_free = tails[swap]
+        free[base + index] = tails_free
+        free_index[base + tails_free] = index
+        free_index[heads] = -1
+        take = grows & ~eats
+        if take.any():
+            self.take_numpy(alive[take], new_alive[take])
+        release = moving & eats
+        if release.any():
+            self.release_numpy(alive[release], tails[release])
+
+        rewards = a["rewards"]
+        rewards[:] = 0.0
+        rewards[dead] = self.death_reward
+        a["terminated"][:] = dead
+        truncated = a["truncated"]
+        if self.max_steps is not None:
+            truncated[:] = ~dead & (steps >= self.max_steps)
+        else:
+            truncated[:] = 0
+
+        eaters = alive[eats]
+        for i in eaters.tolist():
+            rewards[i] = self.eat(i, int(new[i]))
+        for i in np.flatnonzero(dead | (truncated != 0)).tolist():
+            self.finish_env(i)
+
+    def take_numpy(self, games, cells):
+        # take() for one cell in each of the given games
+        a = self.arrays
+        free, free_index, count = a["free"], a["free_index"], a["free_count"]
+        base = games * self.grid_size
+        cells = base + cells
+        index = free_index[cells]
+        last_count = count[games] - 1
+        count[games] = last_count
+        last = free[base + last_count]
+        free[base + index] = last
+        free_index[base + last] = index
+        free_index[cells] = -1
+
+    def release_numpy(self, games, cells):
+        # release() of one cell in each of the given games
+        a = self.arrays
+        free, free_index, count = a["free"], a["free_index"], a["free_count"]
+        base = games * self.grid_size
+        slots = count[games]
+        free[base + slots] = cells
+        free_index[base + cells] = slots
+        count[games] = slots + 1